@@ -0,0 +1,297 @@
+#=============================================================================#
+# Benchmarks
+# Timings and peak memory of the restoration model on the bundled data and on
+# synthetic grids of increasing size (gridrestore.synthetic)
+#
+# python benchmarks.py                               # bundled + 1k/10k/100k nodes
+# python benchmarks.py --sizes bundled,1000 --save baseline.json
+# python benchmarks.py --compare baseline.json       # flag regressions
+#=============================================================================#
+
+import argparse
+import json
+import os
+import multiprocessing
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import numpy as np
+import pandas as pd
+from gridrestore import Grid, assess_damage, damage_fraction, outage, save_timestep, write_synthetic
+
+here = os.path.dirname(os.path.abspath(__file__))
+data_dir = os.path.join(here, '..', 'test')
+
+restore_methods = ['node', 'component', 'hybrid']
+sort_updates = [False, True]
+default_budget = 12.27 # Million dollars per day for the bundled data
+
+
+# ================================#
+# Scenario files
+# ================================#
+def bundled_scenario(workdir, scenario='A'):
+    # Scenario CSVs built from the bundled data by examples/test/prepare_scenarios.py
+    shutil.copy(os.path.join(data_dir, 'data.csv'), workdir)
+    subprocess.check_call([sys.executable, os.path.join(data_dir, 'prepare_scenarios.py')], cwd=workdir)
+    return os.path.join(workdir, 'scenario' + scenario)
+
+
+def synthetic_scenario(workdir, n_nodes, seed=0):
+    # Synthetic system streamed to disk by gridrestore.synthetic
+    filename = os.path.join(workdir, 'synthetic_' + str(n_nodes))
+    return write_synthetic(filename, n_nodes, seed=seed)
+
+
+# ================================#
+# Memory
+# ================================#
+def _status(field):
+    # Current (VmRSS) or peak (VmHWM) resident set size in MB, Linux only
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return float(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return None
+
+
+def _reset_peak():
+    # Reset VmHWM to the current resident set size (Linux >= 4.0)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except IOError:
+        pass
+
+
+def _peak_mb():
+    peak = _status('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 1024.0 ** 2 if sys.platform == 'darwin' else peak / 1024.0
+    return peak
+
+
+# ================================#
+# Run one case in a child process
+# ================================#
+def _measure(func, repeat, queue):
+    # Child forked from the benchmark process: inputs already loaded are shared,
+    # so the memory reported is what the case itself allocates
+    _reset_peak()
+    start = _status('VmRSS')
+    if start is None:
+        start = _peak_mb()
+    times = []
+    for i in range(repeat):
+        setup = func()
+        t0 = timeit.default_timer()
+        setup()
+        times.append(timeit.default_timer() - t0)
+    queue.put((times, _peak_mb() - start))
+
+
+def measure(func, repeat):
+    # func() prepares the inputs and returns the callable to time
+    queue = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_measure, args=(func, repeat, queue))
+    child.start()
+    times, peak = queue.get()
+    child.join()
+    return {'min_s': min(times), 'median_s': float(np.median(times)), 'peak_mb': peak}
+
+
+# ================================#
+# Import time (fresh interpreter each repeat)
+# ================================#
+_import_script = """
+import sys, timeit
+t0 = timeit.default_timer()
+import gridrestore
+t = timeit.default_timer() - t0
+print t, int('pandas' in sys.modules), int('matplotlib' in sys.modules)
+"""
+
+
+def import_time(repeat):
+    times = []
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', _import_script])
+        t, pandas, matplotlib = out.split()
+        times.append(float(t))
+    # Modules that should load only when needed
+    loaded = [name for name, flag in [('pandas', pandas), ('matplotlib', matplotlib)] if flag == '1']
+    return {'min_s': min(times), 'median_s': float(np.median(times)), 'loaded': loaded}
+
+
+# ================================#
+# Cases
+# ================================#
+def cases(filename, n_nodes, backends, repeat, restore_repeat):
+    budget = default_budget * max(n_nodes, 1) / 83.0 # Comparable number of days at every size
+    base = Grid(filename, budget=budget, backend='array', sort_type='Cost')
+    system = base.system
+
+    def grid_init():
+        return lambda: Grid(filename, budget=budget, backend='array', sort_type='Cost')
+
+    def assess():
+        state = pd.DataFrame(index=system.index)
+        return lambda: assess_damage(system, state)
+
+    def fraction():
+        state = base.init_state.copy()
+        return lambda: damage_fraction(system, state)
+
+    def outage_():
+        state = base.init_state.copy()
+        return lambda: outage(system, state, False)
+
+    def save():
+        def run():
+            restore = pd.DataFrame()
+            for t in range(100):
+                restore = save_timestep(restore, system, t, 0.0, 0.5)
+        return run
+
+    yield 'Grid.__init__', grid_init, repeat
+    yield 'assess_damage', assess, repeat
+    yield 'damage_fraction', fraction, repeat
+    yield 'outage', outage_, repeat
+    yield 'save_timestep x100', save, repeat
+
+    for backend in backends:
+        if backend == 'pandas':
+            grid = Grid(filename, budget=budget, backend='pandas', sort_type='Cost')
+        else:
+            grid = base
+        for restore_method in restore_methods:
+            for sort_update in sort_updates:
+
+                def restore(grid=grid, restore_method=restore_method, sort_update=sort_update):
+                    run = grid.fork(restore_method=restore_method, sort_update=sort_update)
+                    return run.restore_grid
+
+                name = 'restore_grid ' + backend + ' ' + restore_method + ' update=' + str(sort_update)
+                yield name, restore, restore_repeat
+
+            if backend == 'array':
+
+                def restore(grid=grid, restore_method=restore_method):
+                    run = grid.fork(restore_method=restore_method, incremental=True)
+                    return run.restore_grid
+
+                yield 'restore_grid array ' + restore_method + ' incremental', restore, restore_repeat
+
+                def restore(grid=grid, restore_method=restore_method):
+                    # Kernels compiled (or loaded from the Numba cache) by an untimed first run
+                    grid.fork(restore_method=restore_method, jit=True).restore_grid()
+                    run = grid.fork(restore_method=restore_method, jit=True)
+                    return run.restore_grid
+
+                yield 'restore_grid array ' + restore_method + ' jit', restore, restore_repeat
+
+
+# ================================#
+# Compare with a saved baseline
+# ================================#
+def compare(results, baseline, tolerance):
+    regressions = []
+    print
+    print '%-52s %10s %10s %8s' % ('case', 'baseline', 'now', 'ratio')
+    for key in sorted(results):
+        if key not in baseline or 'min_s' not in results[key]:
+            continue
+        old = baseline[key]['min_s']
+        new = results[key]['min_s']
+        ratio = new / old if old > 0 else np.inf
+        flag = ''
+        if ratio > 1.0 + tolerance:
+            flag = ' <-- slower'
+            regressions.append(key)
+        print '%-52s %10.4f %10.4f %8.2f%s' % (key, old, new, ratio, flag)
+    return regressions
+
+
+# ================================#
+# Main
+# ================================#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the gridrestore restoration model')
+    parser.add_argument('--sizes', default='bundled,1000,10000,100000',
+                        help='comma separated: bundled and/or synthetic node counts')
+    parser.add_argument('--scenario', default='A', help='bundled scenario (A, B, C or D)')
+    parser.add_argument('--backends', default='array',
+                        help="restore_grid backends, e.g. 'array' or 'pandas,array' (pandas is slow)")
+    parser.add_argument('--repeat', type=int, default=5, help='repeats of the component functions')
+    parser.add_argument('--restore-repeat', type=int, default=1, help='repeats of restore_grid')
+    parser.add_argument('--only', default=None, help='run only cases whose name contains this text')
+    parser.add_argument('--save', default=None, help='write results to this JSON file')
+    parser.add_argument('--compare', default=None, help='baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before flagging')
+    args = parser.parse_args(argv)
+
+    backends = args.backends.split(',')
+    workdir = tempfile.mkdtemp(prefix='gridrestore_bench_')
+    results = {}
+
+    result = import_time(args.repeat)
+    results['import gridrestore'] = result
+    print
+    print '%-52s %10s %10s  %s' % ('case', 'min (s)', 'median (s)', 'loaded')
+    print '%-52s %10.4f %10.4f  %s' % ('import gridrestore', result['min_s'], result['median_s'],
+                                       ', '.join(result['loaded']) or '-')
+    try:
+        bundled = bundled_scenario(workdir, args.scenario)
+        for size in args.sizes.split(','):
+            if size == 'bundled':
+                filename = bundled
+                n_nodes = len(pd.read_csv(filename + '.csv'))
+            else:
+                n_nodes = int(size)
+                filename = synthetic_scenario(workdir, n_nodes)
+
+            print
+            print 'nodes: ' + str(n_nodes) + ' (' + size + ')'
+
+            # Memory held per node by a loaded grid, default and compact tables
+            for compact in [False, True]:
+                budget = default_budget * max(n_nodes, 1) / 83.0
+                usage = Grid(filename, budget=budget, backend='array', sort_type='Cost', compact=compact).memory_usage()
+                results[size + '/memory compact=' + str(compact)] = {'bytes_per_node': usage.sum()}
+                print '%-52s %10.1f  (%s)' % ('bytes per node compact=' + str(compact), usage.sum(),
+                                             ', '.join('%s %.0f' % item for item in usage.iteritems()))
+            print '%-52s %10s %10s %10s' % ('case', 'min (s)', 'median (s)', 'peak (MB)')
+            for name, func, repeat in cases(filename, n_nodes, backends, args.repeat, args.restore_repeat):
+                if args.only is not None and args.only not in name:
+                    continue
+                result = measure(func, repeat)
+                results[size + '/' + name] = result
+                print '%-52s %10.4f %10.4f %10.1f' % (name, result['min_s'], result['median_s'], result['peak_mb'])
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(workdir)
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print
+            print str(len(regressions)) + ' case(s) slower than the baseline'
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
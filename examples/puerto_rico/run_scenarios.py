@@ -1,16 +1,11 @@
-from gridrestore import Grid
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
+from gridrestore import run_sweep, restore_cols
 
 scenarios = ['scenarioA','scenarioB','scenarioC','scenarioD']
-sort_type = 'Cost_Person'
-sort_order = 'Ascending'
-restore_method = 'node'
-sort_update = False
+params = {'budget': [12.27], 'delay': [7], 'sort_type': ['Cost_Person'], 'sort_order': ['Ascending'],
+          'restore_method': ['node'], 'sort_update': [False]}
 
-for scenario in scenarios:
-	grid = Grid(scenario, budget=12.27, delay=7,debug=False, sort_type=sort_type, sort_order=sort_order, sort_update=sort_update, restore_method=restore_method)
-	grid.restore_grid()
-	savename = "Results_" + scenario + ".csv"
-	grid.restore.to_csv(savename)
\ No newline at end of file
+if __name__ == '__main__':
+	results = run_sweep(scenarios, params)
+	for scenario, restore in results.groupby('scenario'):
+		savename = "Results_" + scenario + ".csv"
+		restore.reset_index(drop=True).loc[:, restore_cols].to_csv(savename)
@@ -21,6 +21,9 @@ sort_updates = [False]
 df = pd.DataFrame()
 f,a = plt.subplots(nrows=3,ncols=3)
 
+# Load and damage the scenario once, then fork a restoration run per policy
+base = Grid(scenario, budget=12.27, delay=7,debug=False, backend='array')
+
 
 # Rows
 for i, restore_method in enumerate(restore_methods):
@@ -38,7 +41,7 @@ for i, restore_method in enumerate(restore_methods):
             for sort_update in sort_updates:
 
                 savename = scenario +  '_' + restore_method + '_' + sort_type  + '_'+ sort_order  + '_'+ str(sort_update) + '_'
-                grid = Grid(scenario, budget=12.27, delay=7,debug=False, sort_type=sort_type, sort_order=sort_order, sort_update=sort_update, restore_method=restore_method)
+                grid = base.fork(sort_type=sort_type, sort_order=sort_order, sort_update=sort_update, restore_method=restore_method)
                 grid.restore_grid()
 
                 label = sort_order + '-' + str(sort_update)
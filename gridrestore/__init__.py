@@ -1,3 +1,21 @@
-from fragility_curves import assess_damage
+from fragility_curves import assess_damage, convert_windspeed, FragilityCurve, FragilityTable, \
+    failure_probability, wind_failure_probability, asset_counts, damage_ensemble
 from support_functions import outage, damage_fraction, save_timestep
-from model import Grid
\ No newline at end of file
+from engine import ArrayState, components, state_vars, fraction_vars, priority_keys, rank_nodes, repair_order, \
+    allocate_budget
+from network import Network, Connectivity, read_edges, connected_components
+from topology import Topology
+from heap import IndexedHeap, RepairQueue, repair_passes
+from trajectory import Trajectory, restore_cols
+from ensemble import EnsembleResult, restore_batch, restore_ensemble, restore_orders, \
+    restore_budgets
+from optimize import outage_days, restoration_benefit, wspt_order, optimize_order
+from synthetic import SyntheticSystem, write_synthetic
+from compact import compact_system, compact_state, memory_per_node
+from columnar import convert_scenario, read_columnar, has_columnar, columnar_path
+from scenarios import ScenarioBuilder, build_scenario, scenario_mixes, default_mix
+from sink import ResultSink, read_results, run_summary, available_format
+from store import TrajectoryStore, create_store, open_store
+from model import Grid
+from statistics import EnsembleStats, merge_stats, ensemble_stats
+from sweep import sweep_params, expand_params, run_sweep
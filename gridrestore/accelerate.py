@@ -0,0 +1,158 @@
+#=============================================================================#
+# Compiled Kernels
+# Per-day repair and outage loops compiled with Numba when it is installed,
+# NumPy kernels otherwise
+#=============================================================================#
+
+import math
+import numpy as np
+from gridrestore.engine import ArrayState, allocate_budget, components
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# True when the compiled kernels are used
+available = numba is not None
+
+
+def _jit(func):
+    # error_model='numpy': division by zero gives inf/nan as in NumPy
+    if numba is None:
+        return func
+    return numba.njit(cache=True, error_model='numpy')(func)
+
+
+# ================================#
+# Walk the repair order until the budget is spent (Grid.repair_component arithmetic)
+# ================================#
+@_jit
+def _repair_walk(flat, order, unit_cost, budget, start):
+    n_comp = unit_cost.shape[0]
+    m = order.shape[0]
+    costs = 0.0
+    cursor = -1
+    pos = start
+    while pos < m and costs < budget:
+        j = order[pos]
+        damaged = flat[j]
+        if damaged > 0:
+            unit = unit_cost[j % n_comp]
+            repairable = (budget - costs) / unit
+            if repairable < damaged:
+                flat[j] = damaged - repairable
+                repaired = repairable
+                if cursor < 0:
+                    cursor = pos
+            else:
+                repaired = damaged
+                flat[j] = 0.0
+            costs = costs + repaired * unit
+        pos = pos + 1
+    if cursor < 0:
+        cursor = pos
+    return costs, cursor, pos
+
+
+def repair_walk(damaged, order, unit_cost, budget, start=0):
+    # damaged - (nodes, component types), repaired in place
+    # returns costs, cursor (first position not fully repaired) and the position reached
+    if numba is None:
+        return allocate_budget(damaged, order, unit_cost, budget, start)
+    costs, cursor, end = _repair_walk(damaged.reshape(-1), order, unit_cost, budget, start)
+    return costs, int(cursor), int(end)
+
+
+# ================================#
+# Damage fraction and outage of every node (Topology.damage_fraction / outage arithmetic)
+# ================================#
+@_jit
+def _outage(damaged, counts, region_code, central, solar_cap, wind_cap, total_cap, central_total_cap,
+            population, fraction, outage_fr, outage_pop):
+    n_nodes, n_comp = damaged.shape
+    n_regions = central_total_cap.shape[0]
+    big = np.finfo(np.float64).max
+
+    # Damage fraction and central generation lost in each region
+    central_solar_f_cap = np.zeros(n_regions)
+    central_wind_f_cap = np.zeros(n_regions)
+    for i in range(n_nodes):
+        for j in range(n_comp):
+            f = math.ceil(damaged[i, j])
+            if counts[i, j] > 0:
+                f = f / counts[i, j]
+            fraction[i, j] = f
+        if fraction[i, 0] > 0:
+            fraction[i, 0] = 1.0
+        if central[i]:
+            r = region_code[i]
+            central_solar_f_cap[r] = central_solar_f_cap[r] + fraction[i, 3] * solar_cap[i]
+            central_wind_f_cap[r] = central_wind_f_cap[r] + fraction[i, 4] * wind_cap[i]
+
+    central_pwr_f = np.zeros(n_regions)
+    for r in range(n_regions):
+        if central_total_cap[r] > 0:
+            central_pwr_f[r] = (central_solar_f_cap[r] + central_wind_f_cap[r]) / central_total_cap[r]
+
+    # Outage of each distributed node
+    for i in range(n_nodes):
+        if central[i]:
+            outage_fr[i] = np.nan
+            outage_pop[i] = 0.0
+            continue
+        dist_pwr_f = (fraction[i, 3] * solar_cap[i] + fraction[i, 4] * wind_cap[i]) / total_cap[i]
+        if math.isnan(dist_pwr_f):
+            dist_pwr_f = 0.0
+        elif math.isinf(dist_pwr_f):
+            dist_pwr_f = big if dist_pwr_f > 0 else -big
+        a = central_pwr_f[region_code[i]]
+        power_f = a + dist_pwr_f - a * dist_pwr_f
+        a = fraction[i, 0] + fraction[i, 1] - fraction[i, 0] * fraction[i, 1]
+        network_f = a + fraction[i, 2] - a * fraction[i, 2]
+        total_f = network_f + power_f - network_f * power_f
+        outage_fr[i] = total_f
+        pop = total_f * population[i]
+        outage_pop[i] = 0.0 if math.isnan(pop) else pop
+
+
+# ================================#
+# Restoration state using the compiled kernels
+# ================================#
+class JitState(ArrayState):
+
+    # ================================#
+    # Spend one timestep's budget along the repair order
+    # ================================#
+    def allocate(self, unit_cost, budget):
+        if numba is None or self.queue is not None:
+            return ArrayState.allocate(self, unit_cost, budget)
+        self.own()
+        start = self.cursor
+        costs, self.cursor, end = repair_walk(self.damaged, self.order, unit_cost, budget, start)
+        self.dirty.append(self.order[start:end] // len(components))
+        self.stale = True
+        return costs
+
+    # ================================#
+    # Update damage fraction and outage
+    # ================================#
+    def update_outage(self, topology, incremental=False):
+        if numba is None or incremental or topology.network is not None:
+            return ArrayState.update_outage(self, topology, incremental)
+        n_nodes = topology.n_nodes
+        outage_pop = self.outage_pop
+        self.fraction = np.empty(self.damaged.shape)
+        self.outage_fr = np.empty(n_nodes)
+        self.outage_pop = np.empty(n_nodes)
+        _outage(self.damaged, topology.counts, topology.region_code, topology.central, topology.solar_cap,
+                topology.wind_cap, topology.total_cap, topology.central_total_cap, topology.population,
+                self.fraction, self.outage_fr, self.outage_pop)
+        if outage_pop is None:
+            self.changed = np.arange(n_nodes)
+        else:
+            self.changed = np.flatnonzero(self.outage_pop != outage_pop)
+        self.dirty = []
+        self.stale = True
+        # Summed by NumPy, as in Topology.outage
+        return self.outage_pop.sum() / topology.total_pop
@@ -0,0 +1,108 @@
+#=============================================================================#
+# Columnar Scenario Format
+# Scenario converted once from CSV to a directory of .npy columns, opened by
+# Grid without parsing: numeric columns are memory-mapped, so grids of the same
+# scenario (e.g. sweep workers) share the same pages
+#
+# scenarioA.cols/schema.json    - columns, categories and number of nodes
+# scenarioA.cols/numeric.npy    - (nodes, numeric_cols) float64, column-major
+# scenarioA.cols/region.npy     - region codes (categories in schema.json)
+# scenarioA.cols/central.npy    - central codes (categories in schema.json)
+# scenarioA.cols/node.npy       - node names
+#=============================================================================#
+
+import json
+import os
+import numpy as np
+from gridrestore.fragility_curves import convert_windspeed
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+format_name = 'gridrestore-columnar'
+format_version = 1
+suffix = '.cols'
+
+# Numeric columns of Grid.system (CSV column names differ for the asset counts),
+# including the windspeed units derived from Windspeed_mph
+numeric_cols = ['Population', 'Windspeed_mph', 'Windspeed_ms', 'Windspeed_kmph', 'Windspeed_knots',
+                'Transmission_Towers', 'Substations', 'Distribution_Towers', 'Solar_Farms', 'Wind_Turbines',
+                'Solar_MW', 'Wind_MW', 'Total_MW']
+csv_cols = {'Transmission_Towers': 'Transmission_towers', 'Distribution_Towers': 'Distribution_towers',
+            'Solar_Farms': 'Solar_farms', 'Wind_Turbines': 'Wind_turbines'}
+
+
+def columnar_path(filename):
+    # Directory of a scenario given as for Grid (filename without .csv)
+    return filename + suffix
+
+
+def has_columnar(filename):
+    return os.path.isfile(os.path.join(columnar_path(filename), 'schema.json'))
+
+
+# ================================#
+# Convert a scenario CSV
+# ================================#
+def convert_scenario(filename, path=None):
+    # filename - scenario as for Grid (reads filename + '.csv')
+    # path     - output directory (default filename + '.cols')
+    # returns the output directory
+    if path is None:
+        path = columnar_path(filename)
+    df = pd.read_csv(filename + '.csv')
+    n_nodes = len(df)
+
+    numeric = np.empty((n_nodes, len(numeric_cols)), dtype=np.float64, order='F')
+    for j, col in enumerate(numeric_cols):
+        if col in ['Windspeed_ms', 'Windspeed_kmph', 'Windspeed_knots']:
+            # Same conversion as Grid
+            numeric[:, j] = convert_windspeed(df['Windspeed_mph'], col.split('_')[1])
+        else:
+            numeric[:, j] = np.asarray(df[csv_cols.get(col, col)], dtype=np.float64)
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    np.save(os.path.join(path, 'numeric.npy'), numeric)
+
+    categories = {}
+    for col in ['Region', 'Central']:
+        values = pd.Categorical(df[col].astype(str))
+        categories[col] = [str(c) for c in values.categories]
+        np.save(os.path.join(path, col.lower() + '.npy'), np.asarray(values.codes, dtype=np.int32))
+    np.save(os.path.join(path, 'node.npy'), np.asarray(df['Node'].astype(str), dtype=np.str_))
+
+    # Schema written last: a directory without it is not a scenario
+    schema = {'format': format_name, 'version': format_version, 'n_nodes': n_nodes,
+              'numeric_cols': numeric_cols, 'categories': categories,
+              'source': os.path.basename(filename) + '.csv'}
+    with open(os.path.join(path, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=1, sort_keys=True)
+    return path
+
+
+# ================================#
+# Open as Grid.system
+# ================================#
+def read_columnar(filename, mmap=True):
+    # filename - scenario as for Grid (opens filename + '.cols')
+    # mmap     - True: numeric columns are read-only views of the mapped file
+    path = columnar_path(filename)
+    with open(os.path.join(path, 'schema.json')) as f:
+        schema = json.load(f)
+    if schema.get('format') != format_name or schema.get('version') != format_version:
+        raise ValueError('Not a ' + format_name + ' v' + str(format_version) + ' scenario: ' + path)
+    mmap_mode = 'r' if mmap else None
+    n_nodes = schema['n_nodes']
+
+    # One float64 block, kept as a view (not copied) by the DataFrame
+    numeric = np.load(os.path.join(path, 'numeric.npy'), mmap_mode=mmap_mode)
+    system = pd.DataFrame(numeric, columns=[str(c) for c in schema['numeric_cols']], copy=False)
+
+    # Remaining columns in the order of Grid.system
+    system.insert(0, 'Municipality', np.full(n_nodes, np.nan, dtype=object))
+    system['Node'] = np.load(os.path.join(path, 'node.npy')).astype(object)
+    for col in ['Central', 'Region']:
+        codes = np.load(os.path.join(path, col.lower() + '.npy'))
+        system[col] = pd.Categorical.from_codes(codes, [str(c) for c in schema['categories'][col]])
+    return system
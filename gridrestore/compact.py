@@ -0,0 +1,101 @@
+#=============================================================================#
+# Compact Tables
+# Smaller dtypes for the system and state tables, and memory use per node
+#=============================================================================#
+
+import numpy as np
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Repeated labels, stored as categoricals
+category_cols = ['Municipality', 'Region', 'Central']
+
+# Whole numbers, stored as integers when every value is one
+integer_cols = ['Population', 'Transmission_Towers', 'Substations', 'Distribution_Towers', 'Solar_Farms',
+                'Wind_Turbines']
+
+# Read only through a float64 conversion, stored as float32 when every value converts back exactly
+exact_float32_cols = ['Windspeed_mph']
+
+# Other units of Windspeed_mph, not used by the model
+float32_cols = ['Windspeed_ms', 'Windspeed_kmph', 'Windspeed_knots']
+
+
+# ================================#
+# Smallest integer type holding every value (None if not whole numbers)
+# ================================#
+def integer_dtype(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 or not np.isfinite(values).all() or (values != np.round(values)).any():
+        return None
+    if values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+# ================================#
+# System table with compact dtypes
+# ================================#
+def compact_system(system):
+    # Every value the model reads is unchanged, so results are identical
+    system = system.copy()
+    for col in category_cols:
+        system[col] = system[col].astype('category')
+    for col in integer_cols:
+        dtype = integer_dtype(system[col])
+        if dtype is not None:
+            system[col] = system[col].astype(dtype)
+    for col in exact_float32_cols:
+        values = np.asarray(system[col], dtype=np.float64)
+        if (values.astype(np.float32).astype(np.float64) == values).all():
+            system[col] = values.astype(np.float32)
+    for col in float32_cols:
+        system[col] = system[col].astype(np.float32)
+    return system
+
+
+# ================================#
+# State table with compact dtypes
+# ================================#
+def compact_state(state):
+    state = state.copy()
+    state['municipality'] = state['municipality'].astype('category')
+    state['outage_fr'] = state['outage_fr'].astype(np.float64)
+    return state
+
+
+# ================================#
+# Memory
+# ================================#
+def frame_bytes(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def array_bytes(obj, skip=()):
+    # NumPy arrays held as attributes of obj (arrays in skip are shared and not counted)
+    total = 0
+    for value in vars(obj).values():
+        if isinstance(value, np.ndarray) and not any(value is s for s in skip):
+            total = total + value.nbytes
+    return total
+
+
+def memory_per_node(grid):
+    # grid - Grid; returns bytes per node of each part
+    n_nodes = grid.topology.n_nodes
+    usage = [('system', frame_bytes(grid.system)),
+             ('init_state', frame_bytes(grid.init_state)),
+             ('init_damaged', grid.init_damaged.nbytes),
+             ('topology', array_bytes(grid.topology))]
+    if grid.topology.network is not None:
+        usage.append(('network', array_bytes(grid.topology.network)))
+
+    # Restoration state (the damage array is shared with init_damaged until the first repair)
+    if grid.backend == 'array':
+        usage.append(('state', array_bytes(grid.state_array, skip=[grid.init_damaged])))
+    else:
+        usage.append(('state', frame_bytes(grid._state)))
+
+    names = [name for name, nbytes in usage]
+    return pd.Series([float(nbytes) / n_nodes for name, nbytes in usage], index=names)
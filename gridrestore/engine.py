@@ -0,0 +1,430 @@
+#=============================================================================#
+# Restoration Engine
+# Array-backed restoration state
+#=============================================================================#
+
+import numpy as np
+import math
+from gridrestore.network import Connectivity
+
+# Component types, in the order they are stored in the damage array
+components = ['trans', 'sub', 'dist', 'solar', 'wind']
+state_vars = ['trans_d', 'sub_d', 'dist_d', 'solar_d', 'wind_d']
+fraction_vars = ['trans_fr', 'sub_fr', 'dist_fr', 'solar_fr', 'wind_fr']
+
+
+# ================================#
+# Restoration state stored as (nodes x component types) array
+# ================================#
+class ArrayState(object):
+
+    def __init__(self, frame, damaged=None):
+
+        # Lookup from node label / state variable to array position
+        self.rows = None  # built on the first scalar repair
+        self.cols = dict(zip(state_vars, range(len(state_vars))))
+
+        self.load(frame, damaged)
+
+    # ================================#
+    # Take damaged counts from a state DataFrame (or a shared array)
+    # ================================#
+    def load(self, frame, damaged=None):
+
+        # DataFrame holding every other state column (fractions, outage),
+        # copied by to_frame before it is first written to
+        self.frame = frame
+        self.frame_owned = False
+
+        # Number damaged, one row per node and one column per component type
+        if damaged is None:
+            self.damaged = np.array(frame.loc[:, state_vars].values, dtype=np.float64, order='C')
+        else:
+            # Read-only array shared between runs, copied by own() before the first repair
+            self.damaged = damaged
+
+        # Damage fraction and outage, set by update_outage
+        self.fraction = None
+        self.outage_fr = None
+        self.outage_pop = None
+
+        # Running total for incremental updates: population without power,
+        # central power fault of each region and the nodes repaired since
+        self.total_outage_pop = None
+        self.central_pwr_f = None
+        self.dirty = []
+
+        # Set when the arrays differ from the values stored in frame
+        self.stale = False
+
+        # Repair order is rebuilt by set_priority
+        self.priority = None
+        self.order = None
+        self.cursor = 0
+
+        # Priority queue used instead of the order when the priority is updated
+        # every timestep (set_queue), and the nodes it has taken since the keys
+        # were last updated
+        self.queue = None
+        self.touched = []
+
+        # Nodes whose outage changed in the last update_outage
+        self.changed = None
+
+        # Union-find of the transmission network (built by the first update_outage)
+        self.connectivity = None
+
+    # ================================#
+    # Copy a shared damage array before writing to it
+    # ================================#
+    def own(self):
+        if not self.damaged.flags.writeable:
+            self.damaged = np.array(self.damaged, order='C')
+
+    # ================================#
+    # Fix repair order for a priority (Index of node labels)
+    # ================================#
+    def set_priority(self, priority, restore_method):
+        self.priority = priority
+        self.order = repair_order(self.frame.index.get_indexer(priority), restore_method)
+        self.cursor = 0
+
+    # ================================#
+    # Repair from a priority queue (RepairQueue) from now on
+    # ================================#
+    def set_queue(self, queue):
+        self.queue = queue
+        self.touched = []
+
+    # ================================#
+    # Spend one timestep's budget along the repair order
+    # ================================#
+    def allocate(self, unit_cost, budget):
+        self.own()
+        if self.queue is not None:
+            costs, nodes = self.queue.allocate(self.damaged, unit_cost, budget)
+            self.dirty.append(nodes)
+            self.touched.append(nodes)
+            self.stale = True
+            return costs
+        start = self.cursor
+        costs, self.cursor, end = allocate_budget(self.damaged, self.order, unit_cost, budget, start)
+        self.dirty.append(self.order[start:end] // len(components))
+        self.stale = True
+        return costs
+
+    # ================================#
+    # Repair single component (same arithmetic as Grid.repair_component)
+    # ================================#
+    def repair(self, index, state_var, unit_cost, budget, costs):
+
+        if self.rows is None:
+            self.rows = dict(zip(self.frame.index, range(len(self.frame.index))))
+        i = self.rows[index]
+        j = self.cols[state_var]
+        damaged = self.damaged[i, j]
+
+        if costs < budget and damaged > 0:
+            self.own()
+            repairable = (budget - costs) / unit_cost
+
+            if repairable < damaged:
+                self.damaged[i, j] = damaged - repairable
+                repaired = repairable
+            else:
+                repaired = damaged
+                self.damaged[i, j] = 0.0
+
+            costs = costs + repaired * unit_cost
+            self.dirty.append(np.array([i]))
+            self.stale = True
+
+        return costs
+
+    # ================================#
+    # Skip days spent on the boundary item without changing its ceil'd count
+    # ================================#
+    def quiet_days(self, unit_cost, budget):
+        # Applies those days to the state and returns how many there were and
+        # the cost of each. Outage only depends on the ceil'd counts, so it is
+        # unchanged over these days.
+        if self.cursor >= len(self.order):
+            return 0, 0.0
+        self.own()
+        flat = self.damaged.reshape(-1)
+        j = self.order[self.cursor]
+        unit = float(unit_cost[j % len(unit_cost)])
+        damaged = float(flat[j])
+
+        # Every day starts from costs = 0 and repairs budget / unit of the boundary item
+        repairable = budget / unit
+        spent = repairable * unit
+        if spent != budget:
+            # Rounding leaves money for the next items; step through these days normally
+            return 0, 0.0
+
+        # Repeat the daily subtraction until the ceil'd count would change
+        ceil_damaged = math.ceil(damaged)
+        days = 0
+        while repairable < damaged and math.ceil(damaged - repairable) == ceil_damaged:
+            damaged = damaged - repairable
+            days = days + 1
+
+        if days > 0:
+            flat[j] = damaged
+            self.stale = True
+        return days, spent
+
+    # ================================#
+    # Update damage fraction and outage (vectorized over the topology index)
+    # ================================#
+    def update_outage(self, topology, incremental=False):
+        # incremental - recompute only the nodes repaired since the last update,
+        # plus every node of a region whose central generation changed. The
+        # national total is kept as a running sum (equal to the full sum to
+        # rounding), so the cost of a day follows what was repaired that day.
+        if not incremental or self.fraction is None:
+            outage_pop = self.outage_pop
+            powered = self.reconnect(topology)
+            self.fraction = topology.damage_fraction(self.damaged, powered=powered)
+            self.outage_fr, total_outage_fr = topology.outage(self.fraction)
+            self.outage_pop = np.nan_to_num(self.outage_fr * topology.population)
+            if outage_pop is None:
+                self.changed = np.arange(topology.n_nodes)
+            else:
+                self.changed = np.flatnonzero(self.outage_pop != outage_pop)
+            if incremental:
+                self.total_outage_pop = self.outage_pop.sum()
+                self.central_pwr_f = topology.central_power(self.fraction)
+            self.dirty = []
+            self.stale = True
+            return total_outage_fr
+
+        if len(self.dirty) == 0:
+            self.changed = np.zeros(0, dtype=np.int64)
+            return self.total_outage_pop / topology.total_pop
+        nodes = np.unique(np.concatenate(self.dirty))
+        self.dirty = []
+
+        # Nodes that gained a transmission path through the repaired nodes
+        powered = self.reconnect(topology, nodes)
+        if powered is not None:
+            nodes = np.union1d(nodes, self.connectivity.reached)
+
+        # Damage fraction of the repaired nodes
+        self.fraction[nodes] = topology.damage_fraction(self.damaged[nodes], nodes, powered)
+
+        # Central power of the regions with a repaired central node
+        central = nodes[topology.central[nodes]]
+        if len(central) > 0:
+            regions = np.unique(topology.region_code[central])
+            central_pwr_f = topology.central_power(self.fraction, regions)
+            changed = regions[central_pwr_f != self.central_pwr_f[regions]]
+            self.central_pwr_f[regions] = central_pwr_f
+            if len(changed) > 0:
+                nodes = np.union1d(nodes, topology.members(changed))
+
+        # Outage of the affected nodes and running total
+        outage_fr = topology.node_outage(self.fraction, self.central_pwr_f, nodes)
+        outage_pop = np.nan_to_num(outage_fr * topology.population[nodes])
+        self.total_outage_pop = self.total_outage_pop + (outage_pop - self.outage_pop[nodes]).sum()
+        self.outage_fr[nodes] = outage_fr
+        self.outage_pop[nodes] = outage_pop
+        self.changed = nodes
+        self.stale = True
+        return self.total_outage_pop / topology.total_pop
+
+    # ================================#
+    # Transmission network connectivity (None without a network)
+    # ================================#
+    def reconnect(self, topology, nodes=None):
+        # nodes - nodes repaired since the last update (None: every node)
+        # returns the nodes with a transmission path
+        if topology.network is None:
+            return None
+        if self.connectivity is None:
+            self.connectivity = Connectivity(topology.network, self.damaged[:, 0] <= 0)
+        else:
+            if nodes is None:
+                nodes = np.arange(topology.n_nodes)
+            self.connectivity.repair(nodes[self.damaged[nodes, 0] <= 0])
+        return self.connectivity.powered
+
+    # ================================#
+    # Build DataFrame view of the state
+    # ================================#
+    def to_frame(self):
+        if not self.frame_owned:
+            self.frame = self.frame.copy()
+            self.frame_owned = True
+        if self.stale:
+            for j, state_var in enumerate(state_vars):
+                self.frame.loc[:, state_var] = self.damaged[:, j]
+            if self.fraction is not None:
+                for j, fraction_var in enumerate(fraction_vars):
+                    self.frame.loc[:, fraction_var] = self.fraction[:, j]
+                self.frame.loc[:, 'outage_fr'] = self.outage_fr
+                self.frame.loc[:, 'outage_pop'] = self.outage_pop
+            self.stale = False
+        return self.frame
+
+
+# ================================#
+# Repair priority keys (used by Grid.prioritize)
+# ================================#
+def priority_keys(damaged, unit_cost, population, sort_type, outage_pop=None):
+    # damaged    - (..., nodes, component types); returns keys (..., nodes)
+    # outage_pop - population without power at each node (..., nodes), for 'Outage'
+    repair_cost = damaged[..., 0] * unit_cost[0]
+    for j in range(1, len(unit_cost)):
+        repair_cost = repair_cost + damaged[..., j] * unit_cost[j]
+
+    # Sort type - Outage, Cost, or Cost/Person (keys of the current damage)
+    if sort_type == 'Outage':
+        if outage_pop is None:
+            raise ValueError("sort_type='Outage' requires outage_pop")
+        keys = np.asarray(outage_pop, dtype=np.float64)
+    elif sort_type == 'Cost':
+        keys = repair_cost
+    elif sort_type == 'Cost_Person':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keys = repair_cost / population
+    else:
+        raise ValueError('Unknown sort_type: ' + str(sort_type))
+    return keys
+
+
+# ================================#
+# Node positions in priority order
+# ================================#
+def rank_nodes(keys, sort_order):
+    # Ties keep node order; nan keys go last (first when descending), as in sort_values
+    ranked = np.argsort(keys, axis=-1, kind='mergesort')
+
+    # Ascending vs. Descending
+    if sort_order == 'Descending':
+        ranked = ranked[..., ::-1]
+    return ranked
+
+
+# ================================#
+# Order in which (node, component) items are repaired
+# ================================#
+def repair_order(positions, restore_method):
+    # positions - array positions of nodes, highest priority first (..., nodes)
+    # returns indices into the flattened (nodes x component types) damage array
+    positions = np.asarray(positions)
+    lead = positions.shape[:-1]
+    n_comp = len(components)
+    items = positions[..., :, None] * n_comp + np.arange(n_comp)
+
+    # Node: every component of a node before moving to the next node
+    if restore_method == 'node':
+        order = items.reshape(lead + (-1,))
+
+    # Component: each component type across all nodes in turn
+    elif restore_method == 'component':
+        order = np.swapaxes(items, -1, -2).reshape(lead + (-1,))
+
+    # Hybrid: network (trans, sub, dist) by node, then generation (solar, wind) by node
+    elif restore_method == 'hybrid':
+        order = np.concatenate([items[..., :3].reshape(lead + (-1,)),
+                                items[..., 3:].reshape(lead + (-1,))], axis=-1)
+
+    else:
+        raise ValueError('Unknown restore_method: ' + str(restore_method))
+
+    return order
+
+
+# ================================#
+# Vectorized budget allocation kernel
+# ================================#
+def allocate_budget(damaged, order, unit_cost, budget, start=0, width=16, spent=0.0):
+    # damaged   - (..., nodes, component types) array, repaired in place
+    # order     - flattened item indices from repair_order, (items,) or (..., items)
+    # unit_cost - cost to repair one unit of each component type
+    # budget    - budget of this timestep, scalar or (...)
+    # start     - position in order before which everything is already repaired
+    # spent     - costs already spent in this timestep, scalar or (...)
+    # returns costs, cursor (first position not fully repaired) and the position reached
+    #
+    # Items are repaired in order until the budget runs out: a cumulative sum of
+    # repair cost, cut where the budget is reached, with a partial repair of the
+    # boundary item. The arithmetic follows Grid.repair_component step by step,
+    # so the result is identical to walking the priority list in Python. The
+    # cumulative sum is taken over windows that double in size, so a day only
+    # touches the part of order that the budget reaches. Leading axes are
+    # independent runs (ensemble members, candidate orderings, budgets).
+    if not damaged.flags.c_contiguous:
+        raise ValueError('damaged must be a C-contiguous array')
+    lead = damaged.shape[:-2]
+    n_runs = int(np.prod(lead))
+    flat = damaged.reshape(n_runs, -1)
+    unit = np.asarray(unit_cost, dtype=np.float64)
+    n_comp = len(unit)
+
+    order = np.asarray(order)
+    shared_order = order.ndim == 1
+    if not shared_order:
+        order = order.reshape(n_runs, -1)
+    m = order.shape[-1]
+
+    budget = np.broadcast_to(np.asarray(budget, dtype=np.float64), lead).reshape(n_runs)
+    pos = np.broadcast_to(np.asarray(start, dtype=np.int64), lead).reshape(n_runs).copy()
+    costs = np.broadcast_to(np.asarray(spent, dtype=np.float64), lead).reshape(n_runs).copy()
+    cursor = np.full(n_runs, -1, dtype=np.int64)
+
+    active = (pos < m) & (costs < budget)
+    while active.any():
+        rows = np.flatnonzero(active)
+        cols = pos[rows, None] + np.arange(width)
+        valid = cols < m
+        cols = np.minimum(cols, m - 1)
+        if shared_order:
+            idx = order[cols]
+        else:
+            idx = order[rows[:, None], cols]
+        d = flat[rows[:, None], idx]
+        d[~valid] = 0.0
+        u = unit[idx % n_comp]
+        b = budget[rows, None]
+
+        # Spending before each item, accumulated left to right from costs
+        spent = np.cumsum(np.column_stack((costs[rows], d * u)), axis=1)
+        prev = spent[:, :-1]
+
+        # First item that is not fully repaired within the budget
+        stop = (d > 0) & ((prev >= b) | ((b - prev) / u < d))
+        found = stop.any(axis=1)
+        k = np.where(found, stop.argmax(axis=1), width)
+
+        # Full repairs before the boundary
+        full = valid & (np.arange(width) < k[:, None])
+        flat[np.broadcast_to(rows[:, None], idx.shape)[full], idx[full]] = 0.0
+        costs[rows] = spent[np.arange(len(rows)), k]
+
+        # Partial repair of the boundary item
+        b_at = np.flatnonzero(found)
+        b_rows = rows[b_at]
+        b_k = k[b_at]
+        partial = costs[b_rows] < budget[b_rows]
+        p_at = b_at[partial]
+        p_rows = b_rows[partial]
+        p_u = u[p_at, b_k[partial]]
+        repairable = (budget[p_rows] - costs[p_rows]) / p_u
+        flat[p_rows, idx[p_at, b_k[partial]]] = d[p_at, b_k[partial]] - repairable
+        costs[p_rows] = costs[p_rows] + repairable * p_u
+
+        first = cursor[b_rows] < 0
+        cursor[b_rows[first]] = pos[b_rows[first]] + b_k[first]
+        pos[rows] = np.minimum(np.where(found, pos[rows] + k + 1, pos[rows] + width), m)
+        width = width * 2
+
+        active = (pos < m) & (costs < budget)
+
+    cursor = np.where(cursor < 0, pos, cursor)
+
+    if lead == ():
+        return costs[0], int(cursor[0]), int(pos[0])
+    return costs.reshape(lead), cursor.reshape(lead), pos.reshape(lead)
@@ -0,0 +1,223 @@
+#=============================================================================#
+# Ensemble Restoration
+# Restoration of many runs (damage realizations, candidate orders, budgets)
+# advanced together as arrays
+#=============================================================================#
+
+import itertools
+import numpy as np
+from gridrestore.engine import priority_keys, rank_nodes, repair_order, allocate_budget
+from gridrestore.trajectory import restore_cols
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+
+# ================================#
+# Restoration trajectories of an ensemble
+# ================================#
+class EnsembleResult(object):
+
+    def __init__(self, total_outage_fr, costs, n_steps):
+        # (runs x timesteps); after a run is restored its last value is repeated (costs are 0)
+        self.total_outage_fr = total_outage_fr
+        self.costs = costs
+        # Number of saved timesteps of each run, including t = 0 (len(Grid.restore))
+        self.n_steps = n_steps
+
+    @property
+    def total_pwr_fr(self):
+        return 1.0 - self.total_outage_fr
+
+    @property
+    def time(self):
+        return np.arange(self.total_outage_fr.shape[1])
+
+    # ================================#
+    # Tidy DataFrame: labels of each run, then the Grid.restore columns
+    # ================================#
+    def to_frame(self, total_pop, labels=None):
+        # total_pop - total population of the system
+        # labels    - dict of column name -> one value per run (optional)
+        steps = self.time < self.n_steps[:, None] # timesteps each run saved
+        run, time = np.nonzero(steps)
+        total_outage_fr = self.total_outage_fr[steps]
+        total_pwr_fr = 1.0 - total_outage_fr
+        columns = [time.astype(np.float64), self.costs[steps], total_outage_fr, total_pwr_fr,
+                   total_outage_fr * total_pop, total_pwr_fr * total_pop]
+        table = dict(zip(restore_cols, columns))
+        names = []
+        if labels is not None:
+            names = sorted(labels.keys())
+            for name in names:
+                table[name] = np.asarray(labels[name])[run]
+        return pd.DataFrame(table, columns=names + restore_cols)
+
+
+# ================================#
+# Repair order of each run from its current state
+# ================================#
+def ensemble_order(grid, state, outage_pop):
+    keys = priority_keys(state, grid.unit_cost, grid.topology.population, grid.sort_type, outage_pop)
+    return repair_order(rank_nodes(keys, grid.sort_order), grid.restore_method)
+
+
+# ================================#
+# Restore a batch of runs advanced together as arrays
+# ================================#
+def restore_batch(grid, damaged, order=None, budget=None, delay=None, max_days=None, update=False):
+    # grid    - Grid supplying topology, costs and (when order is None) restoration policy
+    # damaged - number damaged (runs x nodes x component types), repaired in a copy
+    # order   - repair order of each run (runs x items, from repair_order) or one order for
+    #           all runs; None: the grid's policy applied to the damage of each run
+    # budget  - budget (Million dollars per timestep), scalar or one per run
+    # delay   - number of timesteps before restoration begins, scalar or one per run
+    # update  - rank each run again from its current state every timestep (sort_update)
+    # Each run follows the same rules as Grid.restore_grid with backend='array'
+    topology = grid.topology
+    damaged = np.array(damaged, dtype=np.float64, order='C')
+    n_runs = damaged.shape[0]
+    if budget is None:
+        budget = grid.cost['budget']
+    else:
+        budget = np.asarray(budget, dtype=np.float64) * 1E6 # Million dollars
+    budget = np.broadcast_to(budget, (n_runs,))
+    delay = np.broadcast_to(grid.delay if delay is None else delay, (n_runs,))
+
+    # Initial outage
+    fraction = topology.damage_fraction(damaged)
+    outage_fr, total_outage_fr = topology.outage(fraction)
+    total_outage_fr = np.atleast_1d(total_outage_fr)
+
+    # Repair order of each run
+    live = np.flatnonzero(total_outage_fr > 0.001)
+    state = damaged[live]
+    if order is None:
+        outage_pop = np.nan_to_num(outage_fr[live] * topology.population)
+        order = ensemble_order(grid, state, outage_pop)
+    else:
+        order = np.asarray(order)
+        order = np.broadcast_to(order, (n_runs, order.shape[-1]))[live]
+    cursor = np.zeros(len(live), dtype=np.int64)
+    budget = budget[live]
+    delay = delay[live]
+
+    # Results
+    outage_t = [total_outage_fr.copy()]
+    costs_t = [np.zeros(n_runs)]
+    n_steps = np.ones(n_runs, dtype=np.int64)
+
+    t = 0
+    while len(live) > 0 and (max_days is None or t < max_days):
+
+        t = t + 1
+
+        total_outage_fr = outage_t[-1].copy()
+        costs = np.zeros(n_runs)
+
+        # Runs past their delay
+        act = np.flatnonzero(t > delay)
+        if len(act) > 0:
+
+            # Single time step for every run repairing today
+            if len(act) == len(live):
+                sub = state
+                costs[live], cursor, end = allocate_budget(state, order, grid.unit_cost, budget, cursor)
+            else:
+                sub = state[act]
+                costs[live[act]], cursor[act], end = allocate_budget(sub, order[act], grid.unit_cost, budget[act],
+                                                                     cursor[act])
+                state[act] = sub
+
+            # Update damage fraction and outage
+            fraction = topology.damage_fraction(sub)
+            outage_fr, total_outage_fr[live[act]] = topology.outage(fraction)
+
+            # Update sort priority (keys of the current state, as in Grid.prioritize)
+            if update == True:
+                order[act] = ensemble_order(grid, sub, np.nan_to_num(outage_fr * topology.population))
+                cursor[act] = 0
+
+        # Save results
+        outage_t.append(total_outage_fr)
+        costs_t.append(costs)
+        n_steps[live] = t + 1
+
+        # Drop restored runs
+        still = total_outage_fr[live] > 0.001
+        if not still.all():
+            live = live[still]
+            state = state[still]
+            order = order[still]
+            cursor = cursor[still]
+            budget = budget[still]
+            delay = delay[still]
+
+    return EnsembleResult(np.column_stack(outage_t), np.column_stack(costs_t), n_steps)
+
+
+# ================================#
+# Restore every realization of a damage ensemble
+# ================================#
+def restore_ensemble(grid, damaged, max_days=None):
+    # damaged - number damaged (runs x nodes x component types), e.g. from damage_ensemble
+    return restore_batch(grid, damaged, max_days=max_days, update=grid.sort_update)
+
+
+# ================================#
+# Restore the damaged system of a grid under K candidate priorities or policies
+# ================================#
+def restore_orders(grid, priorities=None, policies=None, max_days=None):
+    # priorities - (K x nodes) node positions, highest priority first, repaired with grid.restore_method
+    # policies   - list of K dicts of Grid.fork arguments (budget, delay, sort_type, sort_order,
+    #              restore_method); sort_update is not supported
+    # returns EnsembleResult with one row per candidate
+    n_nodes = grid.topology.n_nodes
+    budget = None
+    delay = None
+
+    if priorities is not None:
+        priorities = np.asarray(priorities)
+        if priorities.ndim != 2 or priorities.shape[1] != n_nodes:
+            raise ValueError('priorities must be (candidates x ' + str(n_nodes) + ') node positions')
+        order = repair_order(priorities, grid.restore_method)
+    elif policies is not None:
+        orders = []
+        budget = []
+        delay = []
+        for policy in policies:
+            candidate = grid.fork(**policy)
+            if candidate.sort_update == True:
+                raise ValueError('restore_orders evaluates fixed orders, sort_update must be False')
+            orders.append(repair_order(rank_nodes(candidate.live_keys(), candidate.sort_order),
+                                       candidate.restore_method))
+            budget.append(candidate.cost['budget'] / 1E6)
+            delay.append(candidate.delay)
+        order = np.array(orders)
+    else:
+        raise ValueError('restore_orders needs priorities or policies')
+
+    damaged = np.broadcast_to(grid.init_damaged, (len(order),) + grid.init_damaged.shape)
+    return restore_batch(grid, damaged, order, budget, delay, max_days)
+
+
+# ================================#
+# Restore the damaged system of a grid for many budgets (and delays) at once
+# ================================#
+def restore_budgets(grid, budgets, delays=None, max_days=None):
+    # budgets - budgets to run (Million dollars per timestep)
+    # delays  - delays to run (timesteps); every budget is run with every delay
+    # returns tidy DataFrame: budget, delay, then the Grid.restore columns
+    # All runs share the damaged state and the priority of the grid
+    if delays is None:
+        delays = [grid.delay]
+    budget, delay = [np.array(values) for values in zip(*itertools.product(budgets, delays))]
+
+    # Priority of the damaged system (a new run, whatever state this grid is in)
+    start = grid.fork()
+    order = repair_order(rank_nodes(start.live_keys(), grid.sort_order), grid.restore_method)
+    update = grid.sort_update == True and grid.sort_type != 'Optimized'
+
+    damaged = np.broadcast_to(grid.init_damaged, (len(budget),) + grid.init_damaged.shape)
+    result = restore_batch(grid, damaged, None if update else order, budget, delay, max_days, update)
+    return result.to_frame(grid.topology.total_pop, {'budget': budget, 'delay': delay})
@@ -11,21 +11,17 @@ import math
 # Assess Hurricane Damage
 # ================================#
 
-def assess_damage(system, state):
+def assess_damage(system, state, table=None):
 
-    state.loc[:, 'trans_d'] = trans_damage(system.loc[:, 'Windspeed_ms'], system.loc[:, 'Transmission_Towers'])
-    state.loc[:, 'sub_d'] = sub_damage(system.loc[:, 'Windspeed_kmph'], system.loc[:, 'Substations'])
-    state.loc[:, 'dist_d'] = dist_damage(system.loc[:, 'Windspeed_ms'], system.loc[:, 'Distribution_Towers'])
-    state.loc[:, 'solar_d'] = solar_damage(system.loc[:, 'Windspeed_mph'], system.loc[:, 'Solar_Farms'])
-    state.loc[:, 'wind_d'] = wind_damage(system.loc[:, 'Windspeed_knots'], system.loc[:, 'Wind_Turbines'])
+    # All component types in one call (see registry below)
+    damaged = failure_probability(system, table) * asset_counts(system)
 
     partial_failures = False
     if partial_failures==False:
-        state.loc[:, 'trans_d'] = np.ceil(state.loc[:, 'trans_d'])
-        state.loc[:, 'sub_d'] = np.ceil(state.loc[:, 'sub_d'])
-        state.loc[:, 'dist_d'] = np.ceil(state.loc[:, 'dist_d'])
-        state.loc[:, 'solar_d'] = np.ceil(state.loc[:, 'solar_d'])
-        state.loc[:, 'wind_d'] = np.ceil(state.loc[:, 'wind_d'])
+        damaged = np.ceil(damaged)
+
+    for j, (name, curve) in enumerate(registry):
+        state.loc[:, name + '_d'] = damaged[:, j]
 
     return state
 
@@ -36,16 +32,7 @@ def trans_damage(wind_ms, trans_length):
     # p_failure = -2.710735810338340000E-12*wind_ms**6 + 1.647468005219630000E-09*wind_ms**5 - 3.746345175184950000E-07*wind_ms**4 + 3.816483952242150000E-05*wind_ms**3 - 1.585646768797350000E-03*wind_ms**2 + 2.229472752851760000E-02*wind_ms - 5.056075618431450000E-02
 
     p_failure = np.interp(wind_ms, trans_x, trans_y)
-    damaged_length = []
-    for i in range(len(p_failure)):
-        p = p_failure[i]
-        if p<0:
-            length= 0.0
-            damaged_length.append(length)
-        else:
-            length = p*trans_length[i]
-            damaged_length.append(length)
-    return damaged_length
+    return np.clip(p_failure, 0.0, None) * np.asarray(trans_length, dtype=np.float64)
 
 # Substation
 sub_x = [40.1487,60.223,80.2974,100.372,119.703,139.777,159.851,179.926,200.0,220.074,240.149,260.223,281.041,301.115]
@@ -54,16 +41,7 @@ def sub_damage(wind_kmph, substations):
     # p_failure = -3.801409548821570000E-15*wind_kmph**6 - 6.113514503951920000E-12*wind_kmph**5 + 5.050350469857500000E-09*wind_kmph**4 - 1.119598812160390000E-06*wind_kmph**3 + 9.567764706108760000E-05*wind_kmph**2 - 2.480663283861870000E-03*wind_kmph + 5.875565991175340000E-03
 
     p_failure = np.interp(wind_kmph, sub_x, sub_y)
-    damaged_subs = []
-    for i in range(len(p_failure)):
-        p = p_failure[i]
-        if p<0:
-            sub= 0.0
-            damaged_subs.append(sub)
-        else:
-            sub = p*substations[i]
-            damaged_subs.append(sub)
-    return damaged_subs
+    return np.clip(p_failure, 0.0, None) * np.asarray(substations, dtype=np.float64)
 
 # Distribution
 dist_x = [34.375,38.1855,40.3024,42.2782,45.3831,48.3468,50.4637,52.0161,53.7097,55.2621,57.379,59.2137,60.9073,62.4597,63.871,65.5645,67.3992,68.8105,70.3629,72.1976,75.0202,77.7016,80.3831,83.2056,86.1694,89.2742,96.8952]
@@ -72,35 +50,16 @@ def dist_damage(wind_ms,dist_length):
     # p_failure = -0.000000000255390841*wind_ms**6 + 0.000000103423463477*wind_ms**5 - 0.000016709417266960*wind_ms**4 + 0.001361824166163350*wind_ms**3 - 0.058282700178697800*wind_ms**2 + 1.245779805212810000*wind_ms - 10.480160018737900000
 
     p_failure = np.interp(wind_ms, dist_x, dist_y)
-    damaged_length = []
-    for i in range(len(p_failure)):
-        p = p_failure[i]
-        if p<0:
-            length= 0.0
-            damaged_length.append(length)
-        else:
-            length = p*dist_length[i]
-            damaged_length.append(length)
-    return damaged_length
+    return np.clip(p_failure, 0.0, None) * np.asarray(dist_length, dtype=np.float64)
 
 # Solar Energy
 solar_x = np.array([90.0,110.2020202,130.0,150.0,170]) + 30.0
 solar_y = [0.0,0.106145251,0.525139665,0.865921788,1.0]
   
 def solar_damage(wind_mph, solar_infra):
-    
+
     p_failure = np.interp(wind_mph, solar_x, solar_y)
-    
-    damaged_solar = []
-    for i in range(len(p_failure)):
-        p = p_failure[i]
-        if p<0:
-            damaged = 0.0
-            damaged_solar.append(damaged)
-        else:
-            damaged = p*solar_infra[i]
-            damaged_solar.append(damaged)
-    return damaged_solar
+    return np.clip(p_failure, 0.0, None) * np.asarray(solar_infra, dtype=np.float64)
 
 # Wind Energy (Yawing)
 # https://www.pnas.org/content/pnas/suppl/2012/02/07/1111769109.DCSupplemental/pnas.1111769109_SI.pdf?targetid=STXT
@@ -112,16 +71,113 @@ wind_x = [97.38019084,101.0869454,108.7957023,116.0578022,120.2056744,123.758619
 wind_y = [0,0.00124533,0.00996264,0.03113325,0.056039851,0.093399751,0.169364882,0.232876712,0.298879203,0.352428394,0.412204234,0.484433375,0.537982565,0.590286426,0.638854296,0.689912827,0.743462017,0.785803238,0.826899128,0.863013699,0.899128269,0.927770859,0.95392279,0.97260274,0.98630137,0.99377335,0.99626401,1]
 
 def wind_damage(wind_knots, wind_infra):
-    
+
     p_failure = np.interp(wind_knots, wind_x, wind_y)
+    return np.clip(p_failure, 0.0, None) * np.asarray(wind_infra, dtype=np.float64)
+
+
+# ================================#
+# Windspeed in the units of a fragility curve
+# ================================#
+def convert_windspeed(wind_mph, units):
+    if units == 'mph':
+        return wind_mph
+    elif units == 'ms':
+        return wind_mph * 0.44704
+    elif units == 'kmph':
+        return wind_mph * 1.60934
+    elif units == 'knots':
+        return wind_mph / 1.15078
+    raise ValueError('Unknown windspeed units: ' + str(units))
+
 
-    damaged_wind = []
-    for i in range(len(p_failure)):
-        p = p_failure[i]
-        if p<0:
-            damaged = 0.0
-            damaged_wind.append(damaged)
-        else:
-            damaged = p*wind_infra[i]
-            damaged_wind.append(damaged)
-    return damaged_wind
\ No newline at end of file
+# ================================#
+# Fragility curve registry
+# ================================#
+class FragilityCurve(object):
+
+    def __init__(self, x, y, units, assets):
+        self.x = np.asarray(x, dtype=np.float64)  # windspeed
+        self.y = np.asarray(y, dtype=np.float64)  # probability of failure
+        self.units = units  # windspeed units of x
+        self.assets = assets  # system column with the number of assets
+
+    def probability(self, wind_mph):
+        p_failure = np.interp(convert_windspeed(wind_mph, self.units), self.x, self.y)
+        return np.clip(p_failure, 0.0, None)
+
+# One curve per component type, in the order of the damage arrays (engine.components)
+registry = [('trans', FragilityCurve(trans_x, trans_y, 'ms', 'Transmission_Towers')),
+            ('sub', FragilityCurve(sub_x, sub_y, 'kmph', 'Substations')),
+            ('dist', FragilityCurve(dist_x, dist_y, 'ms', 'Distribution_Towers')),
+            ('solar', FragilityCurve(solar_x, solar_y, 'mph', 'Solar_Farms')),
+            ('wind', FragilityCurve(wind_x, wind_y, 'knots', 'Wind_Turbines'))]
+asset_cols = [curve.assets for name, curve in registry]
+
+
+# ================================#
+# Precomputed lookup table on a uniform windspeed grid
+# ================================#
+class FragilityTable(object):
+
+    # Every curve is sampled on one uniform grid (mph), so a lookup is index
+    # arithmetic and a linear blend of two rows instead of a binary search per
+    # curve. Values are exact at the grid points; between them the curves'
+    # breakpoints are smoothed over one step, so keep step small (default 0.01 mph).
+    def __init__(self, step=0.01, wind_min=0.0, wind_max=350.0):
+        self.step = step
+        self.wind_min = wind_min
+        n_points = int(np.ceil((wind_max - wind_min) / step)) + 1
+        self.grid = wind_min + step * np.arange(n_points)
+        self.table = np.column_stack([curve.probability(self.grid) for name, curve in registry])
+
+    def probability(self, wind_mph):
+        # Windspeeds outside the grid take the end values (np.interp clamps the same way)
+        n_points = len(self.grid)
+        position = np.clip((np.asarray(wind_mph, dtype=np.float64) - self.wind_min) / self.step, 0, n_points - 1)
+        i = np.minimum(position.astype(np.int64), n_points - 2)
+        weight = (position - i)[..., None]
+        return self.table[i] * (1.0 - weight) + self.table[i + 1] * weight
+
+
+# ================================#
+# Failure probability of every component type (..., nodes, component types)
+# ================================#
+def wind_failure_probability(wind_mph, table=None):
+    # wind_mph - peak windspeed of each node (..., nodes), e.g. several wind fields
+    # table    - optional FragilityTable for lookup by index arithmetic
+    if table is not None:
+        return table.probability(wind_mph)
+    wind_mph = np.asarray(wind_mph, dtype=np.float64)
+    return np.stack([curve.probability(wind_mph) for name, curve in registry], axis=-1)
+
+
+def failure_probability(system, table=None):
+    return wind_failure_probability(system['Windspeed_mph'], table)
+
+
+# ================================#
+# Number of assets of every component type (nodes x component types)
+# ================================#
+def asset_counts(system):
+    return np.column_stack([np.asarray(system[col], dtype=np.float64) for col in asset_cols])
+
+
+# ================================#
+# Monte Carlo damage ensemble
+# ================================#
+def damage_ensemble(system, n_realizations, seed=None):
+    # Each asset fails as a Bernoulli trial with its fragility-curve probability,
+    # drawn for all realizations at once as binomial counts.
+    # seed - int, None or np.random.RandomState; the same seed gives the same ensemble
+    # returns number damaged (realizations x nodes x component types)
+    if isinstance(seed, np.random.RandomState):
+        random_state = seed
+    else:
+        random_state = np.random.RandomState(seed)
+
+    p_failure = failure_probability(system)
+    assets = np.round(np.nan_to_num(asset_counts(system))).astype(np.int64)
+
+    damaged = random_state.binomial(assets, p_failure, size=(n_realizations,) + p_failure.shape)
+    return damaged.astype(np.float64)
@@ -0,0 +1,172 @@
+#=============================================================================#
+# Priority Queue
+# Indexed heap of nodes keyed on their live repair priority
+#=============================================================================#
+
+import heapq
+import math
+import numpy as np
+from gridrestore.engine import components, allocate_budget, rank_nodes
+
+
+# ================================#
+# Heap of node positions with a key update in O(log n)
+# ================================#
+class IndexedHeap(object):
+
+    def __init__(self, n_nodes, sort_order='Ascending'):
+        # Same order as rank_nodes: ties by node position, nan keys last
+        # (Descending reverses all of it)
+        self.descending = sort_order == 'Descending'
+        self.heap = [] # heapq list of entries; entries replaced by update are skipped when popped
+        self.entry = [None] * n_nodes # current entry of each node
+        self.inside = [False] * n_nodes # node is in the heap
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, node):
+        return self.inside[node]
+
+    def make_entry(self, node, key):
+        if math.isnan(key):
+            return (0, 0.0, -node, node) if self.descending else (1, 0.0, node, node)
+        return (1, -key, -node, node) if self.descending else (0, key, node, node)
+
+    # ================================#
+    # Fill from nodes and their keys (sorted, so it is already a heap)
+    # ================================#
+    def build(self, nodes, keys):
+        nodes = np.asarray(nodes)
+        keys = np.asarray(keys, dtype=np.float64)
+        for node, key in zip(nodes.tolist(), keys.tolist()):
+            self.entry[node] = self.make_entry(node, key)
+            self.inside[node] = True
+        ranked = rank_nodes(keys, 'Descending' if self.descending else 'Ascending')
+        self.heap = [self.entry[node] for node in nodes[ranked].tolist()]
+        self.n = len(self.heap)
+
+    # ================================#
+    # Add node (key=None keeps the key it had before)
+    # ================================#
+    def push(self, node, key=None):
+        if key is not None:
+            self.entry[node] = self.make_entry(node, key)
+        self.inside[node] = True
+        self.n = self.n + 1
+        heapq.heappush(self.heap, self.entry[node])
+
+    # ================================#
+    # Remove and return the node with the highest priority
+    # ================================#
+    def pop(self):
+        heap, entry, inside = self.heap, self.entry, self.inside
+        while True:
+            e = heapq.heappop(heap)
+            node = e[3]
+            if inside[node] and entry[node] is e:
+                inside[node] = False
+                self.n = self.n - 1
+                return node
+
+    # ================================#
+    # Change the key of a node
+    # ================================#
+    def update(self, node, key):
+        self.entry[node] = self.make_entry(node, key)
+        if self.inside[node]:
+            heapq.heappush(self.heap, self.entry[node])
+
+            # Drop replaced entries once they outnumber the live ones
+            if len(self.heap) > 2 * self.n + 64:
+                self.heap = [e for e in self.heap if self.inside[e[3]] and self.entry[e[3]] is e]
+                heapq.heapify(self.heap)
+
+
+# ================================#
+# Repair passes of each restore method (component types repaired node by node)
+# ================================#
+def repair_passes(restore_method):
+    n_comp = len(components)
+    if restore_method == 'node':
+        return [range(n_comp)]
+    elif restore_method == 'component':
+        return [[j] for j in range(n_comp)]
+    elif restore_method == 'hybrid':
+        return [[0, 1, 2], [3, 4]]
+    raise ValueError('Unknown restore_method: ' + str(restore_method))
+
+
+# ================================#
+# Repair queue for a priority that is updated every timestep
+# ================================#
+class RepairQueue(object):
+
+    def __init__(self, damaged, keys, restore_method, sort_order):
+        # One heap per repair pass holding the nodes with damage left in that pass.
+        # A day walks the passes in turn, popping nodes in priority order, so it
+        # repairs the same items in the same order as a full sort of the live
+        # keys followed by repair_order.
+        n_nodes = damaged.shape[0]
+        self.passes = [np.array(comps) for comps in repair_passes(restore_method)]
+        self.heaps = []
+        for comps in self.passes:
+            nodes = np.flatnonzero((damaged[:, comps] > 0).any(axis=1))
+            heap = IndexedHeap(n_nodes, sort_order)
+            heap.build(nodes, keys[nodes])
+            self.heaps.append(heap)
+
+        # Number of nodes taken from a heap at once, adapted to the nodes repaired per day
+        self.batch = 16
+
+    # ================================#
+    # Spend one timestep's budget
+    # ================================#
+    def allocate(self, damaged, unit_cost, budget):
+        # returns costs and the nodes repaired (whose keys may have changed)
+        n_comp = len(unit_cost)
+        costs = 0.0
+        popped = []
+        for p, (comps, heap) in enumerate(zip(self.passes, self.heaps)):
+            if costs >= budget:
+                break
+            order = np.zeros(0, dtype=np.int64)
+            nodes = []
+            end = 0
+            batch = self.batch
+            while costs < budget and len(heap) > 0:
+                # Next nodes in priority order (batches double until the budget is spent)
+                taken = [heap.pop() for i in range(min(batch, len(heap)))]
+                nodes.extend(taken)
+                order = np.concatenate((order, (np.array(taken)[:, None] * n_comp + comps).ravel()))
+                batch = batch * 2
+
+                # Continue the walk after the last item reached (not revisited today)
+                costs, cursor, end = allocate_budget(damaged, order, unit_cost, budget, end, spent=costs)
+
+            if len(nodes) > 0:
+                nodes = np.array(nodes)
+
+                # Nodes with damage left in this pass go back with their keys of today
+                left = (damaged[nodes][:, comps] > 0).any(axis=1)
+                for node in nodes[left].tolist():
+                    heap.push(node)
+
+                # Nodes reached today (their keys change) set the first batch of tomorrow
+                reached = -(-end // len(comps))
+                popped.append(nodes[:reached])
+                self.batch = max(16, reached)
+
+        if len(popped) == 0:
+            return costs, np.zeros(0, dtype=np.int64)
+        return costs, np.concatenate(popped)
+
+    # ================================#
+    # New keys for nodes
+    # ================================#
+    def update(self, nodes, keys):
+        for heap in self.heaps:
+            for node, key in zip(nodes.tolist(), keys.tolist()):
+                if node in heap:
+                    heap.update(node, key)
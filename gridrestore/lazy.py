@@ -0,0 +1,31 @@
+#=============================================================================#
+# Lazy Imports
+# Modules loaded on first use, so that importing gridrestore loads only NumPy
+#=============================================================================#
+
+import importlib
+import sys
+
+
+# ================================#
+# Module imported on first attribute access
+# ================================#
+class LazyModule(object):
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr):
+        # Imported on the first access, found in sys.modules after that
+        module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return '<lazy module ' + repr(self._name) + '>'
+
+
+def lazy_import(name):
+    # Already imported: the module itself
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,20 +1,29 @@
-import pandas as pd
 import numpy as np
 import copy
-import matplotlib.pyplot as plt
-from gridrestore import assess_damage, damage_fraction, outage, save_timestep
+from gridrestore import assess_damage, convert_windspeed, damage_fraction, outage, ArrayState, components, state_vars, Topology, Trajectory, \
+    damage_ensemble, restore_ensemble, restore_orders, restore_budgets, priority_keys, rank_nodes, RepairQueue, optimize_order, \
+    read_edges, compact_system, compact_state, memory_per_node, has_columnar, read_columnar
+from gridrestore.lazy import lazy_import
 
-class Grid:
+pd = lazy_import('pandas')
 
-    def __init__(self, filename, budget=12.27, delay=7,debug=False, sort_type='Low', sort_order='Ascending',sort_update=False, restore_method='node'):
+class Grid(object):
+
+    def __init__(self, filename, budget=12.27, delay=7,debug=False, sort_type='Low', sort_order='Ascending',sort_update=False, restore_method='node', backend='pandas', event_driven=False, incremental=False, jit=False, network=None, compact=False):
 
         self.filename = filename
         self.debug = debug
-        self.sort_type = sort_type # 'Low' or 'High'
+        self.sort_type = sort_type # 'Outage', 'Cost', 'Cost_Person' or 'Optimized'
         self.sort_order = sort_order
         self.sort_update = sort_update # True, False
         self.restore_method = restore_method # 'component' or 'node'
         self.delay = delay # number of timesteps before restoration begins
+        self.backend = backend # 'pandas' or 'array' (damaged counts held in a NumPy array)
+        self.event_driven = event_driven # True: jump between days on which the outage can change (array backend)
+        self.incremental = incremental # True: recompute outage only where repairs were made (array backend)
+        self.jit = jit # True: per-day repair and outage compiled with Numba when installed (array backend)
+        self.network = network # edges between nodes (CSV or DataFrame with From/To) or None (single path)
+        self.compact = compact # True: categorical labels and integer counts in system and init_state
 
         # ---------------------------------------
         # Repair cost and budget
@@ -28,47 +37,65 @@ class Grid:
         cost['wind'] = 1750000.0
         # Store
         self.cost = cost
+        self.unit_cost = np.array([cost[component] for component in components])
 
         # ---------------------------------------
         # Import data and extract variables
         #---------------------------------------
-        df = pd.read_csv(filename + '.csv')
-
-        cols = ['Municipality','Population',  # County
-                'Windspeed_mph','Windspeed_ms','Windspeed_kmph','Windspeed_knots',  # Hurricane
-                'Transmission_Towers','Substations','Distribution_Towers','Solar_Farms','Wind_Turbines',  # Infrastructure
-                'Solar_MW','Wind_MW','Total_MW']  # Electric capacity
-        system = pd.DataFrame(columns=cols)
-
-        # General
-        system.loc[:, 'Node'] = df.loc[:, "Node"]  # Name
-        system.loc[:, 'Central'] = df.loc[:, "Central"]  # Y or N
-        system.loc[:, 'Region'] = df.loc[:, "Region"]  # Name
-        system.loc[:, 'Population'] = df.loc[:, "Population"]
-
-        # Hurricane peak windspeed
-        system.loc[:, 'Windspeed_mph'] =  df.loc[:, "Windspeed_mph"]
-
-        # Infrastructure
-        system.loc[:, 'Transmission_Towers']= df.loc[:, "Transmission_towers"]
-        system.loc[:, 'Substations'] = df.loc[:, "Substations"]
-        system.loc[:, 'Distribution_Towers'] = df.loc[:, "Distribution_towers"]
-        system.loc[:, 'Solar_Farms'] = df.loc[:, "Solar_farms"]
-        system.loc[:, 'Wind_Turbines'] = df.loc[:, "Wind_turbines"]
-
-        # Electric grid capacity
-        system.loc[:, 'Solar_MW'] = df.loc[:, "Solar_MW"]
-        system.loc[:, 'Wind_MW'] = df.loc[:, "Wind_MW"]
-        system.loc[:, 'Total_MW'] = df.loc[:, "Total_MW"]
-
-        # Variations of Windspeed
-        system.loc[:, 'Windspeed_ms'] = system.loc[:, 'Windspeed_mph'] * 0.44704
-        system.loc[:, 'Windspeed_kmph'] = system.loc[:, 'Windspeed_mph'] * 1.60934
-        system.loc[:, 'Windspeed_knots'] = system.loc[:, 'Windspeed_mph'] / 1.15078
+        if isinstance(filename, basestring) and has_columnar(filename):
+            # Binary scenario (gridrestore.columnar): opened without parsing, with the
+            # numeric columns memory-mapped and shared by every grid of the scenario
+            system = read_columnar(filename)
+        else:
+            if isinstance(filename, basestring):
+                df = pd.read_csv(filename + '.csv')
+            else:
+                df = filename # Scenario table in memory (e.g. gridrestore.scenarios)
+
+            cols = ['Municipality','Population',  # County
+                    'Windspeed_mph','Windspeed_ms','Windspeed_kmph','Windspeed_knots',  # Hurricane
+                    'Transmission_Towers','Substations','Distribution_Towers','Solar_Farms','Wind_Turbines',  # Infrastructure
+                    'Solar_MW','Wind_MW','Total_MW']  # Electric capacity
+            system = pd.DataFrame(columns=cols)
+
+            # General
+            system.loc[:, 'Node'] = df.loc[:, "Node"]  # Name
+            system.loc[:, 'Central'] = df.loc[:, "Central"]  # Y or N
+            system.loc[:, 'Region'] = df.loc[:, "Region"]  # Name
+            system.loc[:, 'Population'] = df.loc[:, "Population"]
+
+            # Hurricane peak windspeed
+            system.loc[:, 'Windspeed_mph'] =  df.loc[:, "Windspeed_mph"]
+
+            # Infrastructure
+            system.loc[:, 'Transmission_Towers']= df.loc[:, "Transmission_towers"]
+            system.loc[:, 'Substations'] = df.loc[:, "Substations"]
+            system.loc[:, 'Distribution_Towers'] = df.loc[:, "Distribution_towers"]
+            system.loc[:, 'Solar_Farms'] = df.loc[:, "Solar_farms"]
+            system.loc[:, 'Wind_Turbines'] = df.loc[:, "Wind_turbines"]
+
+            # Electric grid capacity
+            system.loc[:, 'Solar_MW'] = df.loc[:, "Solar_MW"]
+            system.loc[:, 'Wind_MW'] = df.loc[:, "Wind_MW"]
+            system.loc[:, 'Total_MW'] = df.loc[:, "Total_MW"]
+
+            # Variations of Windspeed
+            system.loc[:, 'Windspeed_ms'] = convert_windspeed(system.loc[:, 'Windspeed_mph'], 'ms')
+            system.loc[:, 'Windspeed_kmph'] = convert_windspeed(system.loc[:, 'Windspeed_mph'], 'kmph')
+            system.loc[:, 'Windspeed_knots'] = convert_windspeed(system.loc[:, 'Windspeed_mph'], 'knots')
+
+        # Categorical labels and integer counts (same values, less memory)
+        if compact == True:
+            system = compact_system(system)
 
         # Store Dataframe
         self.system = system
 
+        # Region/central index used by the vectorized outage calculation, with the
+        # transmission network when one is given
+        edges = None if network is None else read_edges(network, system)
+        self.topology = Topology(system, edges)
+
         # ---------------------------------------
         # State of electric grid after hurricane
         # ---------------------------------------
@@ -85,33 +112,126 @@ class Grid:
         init_state = assess_damage(system, init_state)
 
         # Damage fraction and initial outage
-        init_state = damage_fraction(self.system, init_state)
-        init_state, self.total_outage_fr = outage(self.system, init_state, self.debug)
+        init_state = damage_fraction(self.system, init_state, self.powered(init_state))
+        init_state, self.init_outage_fr = outage(self.system, init_state, self.debug)
 
         # Store
+        if compact == True:
+            init_state = compact_state(init_state)
         self.init_state = init_state
 
-        # Create copy of init_state to update during restoration
-        state = copy.deepcopy(init_state)
-        self.state = state
+        # Number damaged as a read-only array, shared by every restoration run (copy-on-write)
+        self.init_damaged = np.array(init_state.loc[:, state_vars].values, dtype=np.float64, order='C')
+        self.init_damaged.flags.writeable = False
 
         # ---------------------------------------
         # Analyze Repair
         # ---------------------------------------
         # Total Repair cost
-        self.repair_cost = state.loc[:, 'trans_d'] * cost['trans'] + state.loc[:, 'sub_d'] * cost['sub'] \
-                           + state.loc[:, 'dist_d'] * cost['dist'] + state.loc[:, 'solar_d'] * cost['solar'] \
-                           + state.loc[:, 'wind_d'] * cost['wind']
+        self.repair_cost = init_state.loc[:, 'trans_d'] * cost['trans'] + init_state.loc[:, 'sub_d'] * cost['sub'] \
+                           + init_state.loc[:, 'dist_d'] * cost['dist'] + init_state.loc[:, 'solar_d'] * cost['solar'] \
+                           + init_state.loc[:, 'wind_d'] * cost['wind']
 
         self.total_cost = sum(self.repair_cost) / 1E6  # Million (M$)
         self.repair_time = self.total_cost * 1E6 / cost['budget'] # Days
 
+        # Optimized priorities by (budget, delay, restore_method), shared with forks
+        self.optimized = {}
+
         # ---------------------------------------
-        # Prepare Dataframe to store grid restoration
+        # State to update during restoration and buffer to store it
         # ---------------------------------------
-        cols = ['time', 'costs','total_outage_fr', 'total_pwr_fr', 'pop_wo_pwr', 'pop_w_pwr',]
-        self.restore = pd.DataFrame(columns=cols)
-        self.restore = save_timestep(self.restore, self.system, 0, 0, self.total_outage_fr)
+        self.reset()
+
+    # ================================#
+    # Nodes with a transmission path (None without a network)
+    # ================================#
+    def powered(self, state):
+        if self.topology.network is None:
+            return None
+        return self.topology.network.powered(np.asarray(state.loc[:, 'trans_d'], dtype=np.float64) <= 0)
+
+    # ================================#
+    # Start restoration over from the damaged state
+    # ================================#
+    def reset(self):
+
+        self.total_outage_fr = self.init_outage_fr
+
+        # Copy of init_state to update during restoration
+        if self.backend == 'array' and self.jit == True:
+            # Imported here: Numba is optional and slow to import
+            from gridrestore.accelerate import JitState
+            self.state_array = JitState(self.init_state, self.init_damaged)
+        elif self.backend == 'array':
+            self.state_array = ArrayState(self.init_state, self.init_damaged)
+        else:
+            self._state = copy.deepcopy(self.init_state)
+
+        # Buffer to store grid restoration
+        self.trajectory = Trajectory(self.topology.total_pop)
+        self.trajectory.append(0, 0, self.total_outage_fr)
+        self._restore = None
+
+    # ================================#
+    # New restoration run of the same damaged system with its own policy
+    # ================================#
+    def fork(self, budget=None, delay=None, sort_type=None, sort_order=None, sort_update=None,
+             restore_method=None, event_driven=None, incremental=None, jit=None):
+
+        # The CSV is not read again and damage is not recomputed: system, topology,
+        # init_state and init_damaged are shared, and the restoration state copies
+        # the damage array only when the first repair is made. Arguments left as
+        # None keep this grid's setting.
+        grid = copy.copy(self)
+        grid.cost = dict(self.cost)
+        if budget is not None:
+            grid.cost['budget'] = budget * 1E6 # Million dollars
+            grid.repair_time = grid.total_cost * 1E6 / grid.cost['budget'] # Days
+        if delay is not None:
+            grid.delay = delay
+        if sort_type is not None:
+            grid.sort_type = sort_type
+        if sort_order is not None:
+            grid.sort_order = sort_order
+        if sort_update is not None:
+            grid.sort_update = sort_update
+        if restore_method is not None:
+            grid.restore_method = restore_method
+        if event_driven is not None:
+            grid.event_driven = event_driven
+        if incremental is not None:
+            grid.incremental = incremental
+        if jit is not None:
+            grid.jit = jit
+
+        grid.reset()
+        return grid
+
+    # ================================#
+    # Current state (DataFrame)
+    # ================================#
+    @property
+    def state(self):
+        if self.backend == 'array':
+            return self.state_array.to_frame()
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        if self.backend == 'array':
+            self.state_array.load(state)
+        else:
+            self._state = state
+
+    # ================================#
+    # Grid restoration (DataFrame built from the trajectory buffer when read)
+    # ================================#
+    @property
+    def restore(self):
+        if self._restore is None or len(self._restore) != len(self.trajectory):
+            self._restore = self.trajectory.to_frame()
+        return self._restore
 
     # ================================#
     # Determine repair priority
@@ -127,25 +247,14 @@ class Grid:
         # to_sort = pd.concat([self.system, self.state], axis=1)
 
 
-        # Sort type - Outage, Cost, or Cost/Person
-        if self.sort_type =='Outage':
-            sorted = self.repair_cost.sort_values()
-
-        elif self.sort_type =='Cost':
-            sorted = self.repair_cost.sort_values()
-
-        elif self.sort_type =='Cost_Person':
-            cost_person = self.repair_cost / self.system.loc[:,"Population"]
-            sorted = cost_person.sort_values()
-
+        # Sort type - Outage, Cost, or Cost/Person, keyed on the current state
+        # (remaining repair cost, population without power)
+        keys = self.live_keys()
 
         # Ascending vs. Descending
-        if self.sort_order == 'Ascending':
-            sorted = sorted
-        elif self.sort_order == 'Descending':
-            sorted = sorted[::-1]
+        sorted = rank_nodes(keys, self.sort_order)
 
-        priority = sorted.index
+        priority = self.init_state.index[sorted]
 
         # # Prioritize based on
         # if self.sort_type == 'Low': # 'Low' Outage
@@ -181,27 +290,111 @@ class Grid:
 
         return priority
 
+    # ================================#
+    # Priority keys of the current state (all nodes or array positions)
+    # ================================#
+    def live_keys(self, nodes=None):
+
+        # Optimized: position in the optimized order (fixed, does not change with the state)
+        if self.sort_type == 'Optimized':
+            keys = np.empty(self.topology.n_nodes)
+            keys[self.optimize()] = np.arange(self.topology.n_nodes)
+            return keys if nodes is None else keys[nodes]
+
+        if self.backend == 'array':
+            damaged = self.state_array.damaged
+            outage_pop = self.state_array.outage_pop
+            if outage_pop is None:
+                outage_pop = self.init_state.loc[:, 'outage_pop'].values
+        else:
+            damaged = self.state.loc[:, state_vars].values
+            outage_pop = self.state.loc[:, 'outage_pop'].values
+        damaged = np.asarray(damaged, dtype=np.float64)
+        outage_pop = np.asarray(outage_pop, dtype=np.float64)
+        population = self.topology.population
+
+        if nodes is not None:
+            damaged = damaged[nodes]
+            outage_pop = outage_pop[nodes]
+            population = population[nodes]
+
+        return priority_keys(damaged, self.unit_cost, population, self.sort_type, outage_pop)
+
+    # ================================#
+    # Repair order minimizing customer-outage-days (sort_type='Optimized')
+    # ================================#
+    def optimize(self, time_limit=10.0, seed=None):
+        # WSPT greedy improved by local search for time_limit seconds, computed once
+        # for each budget, delay and restore_method
+        key = (self.cost['budget'], self.delay, self.restore_method)
+        if key not in self.optimized:
+            self.optimized[key] = optimize_order(self, time_limit, seed=seed)
+        return self.optimized[key]
+
+    # ================================#
+    # New keys for the nodes whose priority changed (array backend, sort_update)
+    # ================================#
+    def update_queue(self):
+
+        state = self.state_array
+        nodes = state.touched
+        if self.sort_type == 'Outage' and state.changed is not None:
+            nodes = nodes + [state.changed]
+        state.touched = []
+        state.changed = None
+
+        if len(nodes) > 0:
+            nodes = np.unique(np.concatenate(nodes))
+            state.queue.update(nodes, self.live_keys(nodes))
+
     # ================================#
     # Plot restoration
     # ================================#
-    def plot(self):
-        plt.plot(self.restore.t, self.restore.t)
-        plt.xlabel('Timesteps (-)')
-        plt.ylabel('% With Power')
+    def plot(self, ax=None, **kwargs):
+        # Imported here: matplotlib is optional (pip install gridrestore[plot])
+        from gridrestore.plotting import plot_restore
+        return plot_restore(self.restore, ax=ax, **kwargs)
+
+    # ================================#
+    # Memory use per node (bytes) of the tables and arrays held by this grid
+    # ================================#
+    def memory_usage(self):
+        return memory_per_node(self)
 
     # ================================#
     # Save restoration to CSV
     # ================================#
     def save_csv(self, savename):
-        self.restore.to_csv(savename + '.csv')
+        self.trajectory.to_csv(savename + '.csv')
 
     # ================================#
     # Restore electric grid
     # ================================#
-    def restore_grid(self):
+    def restore_grid(self, sink=None, labels=None):
+        # sink   - ResultSink the trajectory and summary of this run are streamed to (optional)
+        # labels - dict of name -> value written with the run (e.g. scenario, policy)
 
         priority = self.prioritize()
 
+        if self.event_driven == True:
+            self.restore_events(priority)
+        else:
+            self.restore_days(priority)
+
+        if sink is not None:
+            sink.write(self.trajectory.columns(), labels)
+
+    # ================================#
+    # Restore electric grid, one timestep at a time
+    # ================================#
+    def restore_days(self, priority):
+
+        # Priority updated every timestep: keys of the repaired nodes are
+        # updated in a priority queue instead of sorting every node again
+        if self.sort_update == True and self.backend == 'array':
+            self.state_array.set_queue(RepairQueue(self.state_array.damaged, self.live_keys(),
+                                                   self.restore_method, self.sort_order))
+
         t = 0
         while self.total_outage_fr > 0.001:
 
@@ -214,21 +407,86 @@ class Grid:
                 costs = self.timestep(priority)
 
                 # Update damage fraction and outage
-                self.state = damage_fraction(self.system, self.state)
-                self.state, self.total_outage_fr = outage(self.system, self.state, self.debug)
+                if self.backend == 'array':
+                    self.total_outage_fr = self.state_array.update_outage(self.topology, self.incremental)
+                    if self.debug == True:
+                        print "total_outage_fr (%): " + str(round(self.total_outage_fr * 100.0, 2))
+                else:
+                    self.state = damage_fraction(self.system, self.state, self.powered(self.state))
+                    self.state, self.total_outage_fr = outage(self.system, self.state, self.debug)
 
             # Save results
-            self.restore = save_timestep(self.restore, self.system, t, costs, self.total_outage_fr)
+            self.trajectory.append(t, costs, self.total_outage_fr)
 
             # Update sort priority
             if self.sort_update==True:
-                priority = self.prioritize()
+                if self.backend == 'array':
+                    self.update_queue()
+                else:
+                    priority = self.prioritize()
+
+    # ================================#
+    # Restore electric grid, jumping directly between completion events
+    # ================================#
+    def restore_events(self, priority):
+
+        # With a fixed priority and budget, the outage only changes on days when a
+        # ceil'd damage count changes. Days in between are filled with the
+        # unchanged outage value instead of being simulated.
+        if self.backend != 'array' or self.sort_update == True:
+            raise ValueError("event_driven requires backend='array' and sort_update=False")
+
+        self.state_array.set_priority(priority, self.restore_method)
+
+        # Delay - no repairs, outage unchanged
+        t = 0
+        if self.total_outage_fr > 0.001 and self.delay > 0:
+            self.trajectory.extend(np.arange(1, self.delay + 1), 0.0, self.total_outage_fr)
+            t = self.delay
+
+        while self.total_outage_fr > 0.001:
+
+            # Days until the next change of a ceil'd damage count
+            days, costs = self.state_array.quiet_days(self.unit_cost, self.cost['budget'])
+            if days > 0:
+                self.trajectory.extend(np.arange(t + 1, t + days + 1), costs, self.total_outage_fr)
+                t = t + days
+
+            # Event - repair and recompute outage
+            t = t + 1
+            costs = self.timestep(priority)
+            self.total_outage_fr = self.state_array.update_outage(self.topology, self.incremental)
+            if self.debug == True:
+                print "total_outage_fr (%): " + str(round(self.total_outage_fr * 100.0, 2))
+            self.trajectory.append(t, costs, self.total_outage_fr)
+
+    # ================================#
+    # Restore an ensemble of stochastic damage realizations
+    # ================================#
+    def restore_ensemble(self, n_realizations, seed=None, max_days=None):
+        damaged = damage_ensemble(self.system, n_realizations, seed)
+        return restore_ensemble(self, damaged, max_days)
+
+    # ================================#
+    # Restore the damaged system under K candidate priorities or policies at once
+    # ================================#
+    def restore_orders(self, priorities=None, policies=None, max_days=None):
+        return restore_orders(self, priorities, policies, max_days)
+
+    # ================================#
+    # Restore the damaged system for many budgets (and delays) in one batched run
+    # ================================#
+    def restore_budgets(self, budgets, delays=None, max_days=None):
+        return restore_budgets(self, budgets, delays, max_days)
 
     # ================================#
     # Repair single component in a given timestep
     # ================================#
     def repair_component(self, index, state_var, cost_var, costs):
 
+        if self.backend == 'array':
+            return self.state_array.repair(index, state_var, self.cost[cost_var], self.cost['budget'], costs)
+
         if costs < self.cost['budget'] and self.state.loc[index, state_var] > 0:
             repairable = (self.cost['budget'] - costs) / self.cost[cost_var]
 
@@ -249,6 +507,14 @@ class Grid:
     # ================================#
     def timestep(self, priority):
 
+        # --------------------------- #
+        # Array backend - vectorized budget allocation (all methods)
+        # --------------------------- #
+        if self.backend == 'array':
+            if self.state_array.queue is None and priority is not self.state_array.priority:
+                self.state_array.set_priority(priority, self.restore_method)
+            return self.state_array.allocate(self.unit_cost, self.cost['budget'])
+
         costs = 0.0
 
         # --------------------------- #
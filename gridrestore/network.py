@@ -0,0 +1,186 @@
+#=============================================================================#
+# Transmission Network
+# Optional edges between nodes: a node has a transmission path when it is
+# connected to a central plant through nodes whose towers are all standing
+#=============================================================================#
+
+import numpy as np
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+
+# ================================#
+# Edges as node positions
+# ================================#
+def read_edges(edges, system):
+    # edges  - CSV filename (without .csv, as for Grid) or DataFrame with 'From' and 'To' node names
+    # system - Grid.system
+    if isinstance(edges, basestring):
+        edges = pd.read_csv(edges + '.csv')
+    position = pd.Series(np.arange(len(system)), index=np.asarray(system['Node']))
+    pairs = np.column_stack((position.reindex(np.asarray(edges['From'])).values,
+                             position.reindex(np.asarray(edges['To'])).values))
+    if np.isnan(pairs).any():
+        raise ValueError('Edges between unknown nodes')
+    return pairs.astype(np.int64)
+
+
+# ================================#
+# Connected components of the undamaged nodes (from scratch)
+# ================================#
+def connected_components(n_nodes, u, v):
+    # u, v - ends of the edges to use
+    # returns the label of each node: the smallest node of its component
+    label = np.arange(n_nodes)
+    while True:
+        # Hook the larger root of every edge across two components onto the smaller
+        lu = label[u]
+        lv = label[v]
+        across = lu != lv
+        if not across.any():
+            return label
+        np.minimum.at(label, np.maximum(lu, lv)[across], np.minimum(lu, lv)[across])
+
+        # Point every node at its root (labels only decrease, so there are no cycles)
+        while True:
+            root = label[label]
+            if np.array_equal(root, label):
+                break
+            label = root
+
+
+# ================================#
+# Network built once per system
+# ================================#
+class Network(object):
+
+    def __init__(self, n_nodes, edges, source):
+        # edges  - (edges, 2) node positions
+        # source - nodes that supply power (central plants)
+        self.n_nodes = n_nodes
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        self.u = edges[:, 0]
+        self.v = edges[:, 1]
+        self.n_edges = len(edges)
+        self.source = np.zeros(n_nodes, dtype=bool)
+        self.source[source] = True
+
+        # Neighbours of each node: neighbours[start[i]:start[i + 1]]
+        ends = np.concatenate((self.u, self.v))
+        other = np.concatenate((self.v, self.u))
+        order = np.argsort(ends, kind='mergesort')
+        self.neighbours = other[order]
+        self.start = np.searchsorted(ends[order], np.arange(n_nodes + 1))
+
+        # Nodes without a source even when every tower stands keep the single path
+        # rule (cut only by their own towers), so full repair restores every node
+        self.islanded = np.zeros(n_nodes, dtype=bool)
+        self.islanded = ~self.powered(np.ones(n_nodes, dtype=bool))
+
+    # ================================#
+    # Nodes with a path to a live source
+    # ================================#
+    def powered(self, up):
+        # up - (..., nodes) transmission undamaged; leading dimensions are independent runs
+        # (solved together as one graph of disjoint copies)
+        lead = up.shape[:-1]
+        up = up.reshape(-1, self.n_nodes)
+        n_runs = up.shape[0]
+        offset = (np.arange(n_runs) * self.n_nodes)[:, None]
+        u = (self.u + offset).ravel()
+        v = (self.v + offset).ravel()
+        up = up.ravel()
+        used = up[u] & up[v]
+        label = connected_components(len(up), u[used], v[used])
+
+        live = np.zeros(len(up), dtype=bool)
+        live[label[up & np.tile(self.source, n_runs)]] = True
+        return (up & (live[label] | np.tile(self.islanded, n_runs))).reshape(lead + (self.n_nodes,))
+
+
+# ================================#
+# Union-find over the undamaged nodes of one run, updated as towers are repaired
+# ================================#
+class Connectivity(object):
+
+    def __init__(self, network, up):
+        # up - (nodes) transmission undamaged at the start
+        self.network = network
+        self.up = np.array(up, dtype=bool)
+        used = self.up[network.u] & self.up[network.v]
+        label = connected_components(network.n_nodes, network.u[used], network.v[used])
+
+        # Labels are roots, so they start the forest
+        self.parent = label.tolist()
+        self.size = np.bincount(label, minlength=network.n_nodes).tolist()
+        live = np.zeros(network.n_nodes, dtype=bool)
+        live[label[self.up & network.source]] = True
+        self.live = live.tolist() # component (by root) reaches a source
+        self.powered = self.up & (live[label] | network.islanded)
+        self.reached = np.zeros(0, dtype=np.int64) # nodes that gained a path in the last repair
+
+        # Nodes of each component without a source, listed when a source is reached
+        self.members = {}
+        nodes = np.flatnonzero(self.up & ~self.powered)
+        for node, root in zip(nodes.tolist(), label[nodes].tolist()):
+            self.members.setdefault(root, []).append(node)
+
+    def find(self, node):
+        parent = self.parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(self, a, b, reached):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] = self.size[a] + self.size[b]
+
+        # Component without a source joins one with a source: all of its nodes are powered
+        if self.live[a] and not self.live[b]:
+            reached.extend(self.members.pop(b))
+        elif self.live[b] and not self.live[a]:
+            reached.extend(self.members.pop(a))
+            self.live[a] = True
+        elif not self.live[a]:
+            members = self.members.pop(b)
+            self.members[a].extend(members)
+
+    # ================================#
+    # Add nodes whose transmission was repaired
+    # ================================#
+    def repair(self, nodes):
+        # nodes - nodes now undamaged (those already up are ignored)
+        # returns the nodes that gained a path to a source
+        nodes = np.unique(nodes)
+        nodes = nodes[~self.up[nodes]]
+        network = self.network
+        up = self.up
+        reached = []
+        for node in nodes.tolist():
+            # Joined to its neighbours that are already up (later nodes join it in turn)
+            up[node] = True
+            if network.islanded[node]:
+                reached.append(node)
+                continue
+            if network.source[node]:
+                self.live[node] = True
+                reached.append(node)
+            else:
+                self.members[node] = [node]
+            for other in network.neighbours[network.start[node]:network.start[node + 1]].tolist():
+                if up[other]:
+                    self.union(node, other, reached)
+        self.reached = np.array(reached, dtype=np.int64)
+        self.powered[self.reached] = True
+        return self.reached
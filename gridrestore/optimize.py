@@ -0,0 +1,107 @@
+#=============================================================================#
+# Restoration Order Optimizer
+# Priority that minimizes customer-outage-days (area under pop_wo_pwr)
+#=============================================================================#
+
+import time
+import numpy as np
+from gridrestore.engine import priority_keys, rank_nodes
+from gridrestore.ensemble import restore_orders
+
+
+# ================================#
+# Customer-outage-days of each run (area under pop_wo_pwr)
+# ================================#
+def outage_days(result, total_pop):
+    # result - EnsembleResult; timesteps after a run is restored are not counted
+    steps = np.arange(result.total_outage_fr.shape[1]) < result.n_steps[:, None]
+    return (result.total_outage_fr * steps).sum(axis=1) * total_pop
+
+
+# ================================#
+# Population restored by repairing each node on its own
+# ================================#
+def restoration_benefit(topology, damaged):
+    # damaged - (nodes, component types)
+    fraction = topology.damage_fraction(damaged)
+    outage_fr, total_outage_fr = topology.outage(fraction)
+    outage_pop = np.nan_to_num(outage_fr * topology.population)
+    central_pwr_f = topology.central_power(fraction)
+
+    # Distributed node: its own network and generation repaired, central power unchanged
+    benefit = outage_pop - np.nan_to_num(central_pwr_f[topology.region_code] * topology.population)
+
+    # Central node: central power fault of its region without this node's damage,
+    # applied to every distributed node of the region
+    for node in topology.central_nodes:
+        region = topology.region_code[node]
+        repaired = fraction.copy()
+        repaired[node] = 0.0
+        new_pwr_f = central_pwr_f.copy()
+        new_pwr_f[region] = topology.central_power(repaired, [region])[0]
+        members = topology.members([region])
+        members = members[topology.distributed[members]]
+        new_outage = topology.node_outage(repaired, new_pwr_f, members)
+        benefit[node] = (outage_pop[members] - new_outage * topology.population[members]).sum()
+
+    return np.maximum(benefit, 0.0)
+
+
+# ================================#
+# Weighted shortest processing time: population restored per dollar, highest first
+# ================================#
+def wspt_order(grid):
+    damaged = grid.init_damaged
+    repair_cost = priority_keys(damaged, grid.unit_cost, grid.topology.population, 'Cost')
+    benefit = restoration_benefit(grid.topology, damaged)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = benefit / repair_cost
+
+    # Nothing to repair: last; no benefit: by repair cost after every node with a benefit
+    ratio[repair_cost == 0] = -np.inf
+    none = (benefit == 0) & (repair_cost > 0)
+    ratio[none] = -1.0 - repair_cost[none] / repair_cost.max()
+    return rank_nodes(-ratio, 'Ascending')
+
+
+# ================================#
+# WSPT order improved by local search within a time limit
+# ================================#
+def optimize_order(grid, time_limit=10.0, batch=32, seed=None):
+    # grid       - Grid (damaged system, budget, delay and restore_method)
+    # time_limit - seconds spent on local search after the greedy order
+    # batch      - neighbouring orders evaluated together in one batched run
+    # returns node positions, highest priority first
+    random = np.random.RandomState(seed)
+    total_pop = grid.topology.total_pop
+    start = time.time()
+
+    order = wspt_order(grid)
+    best = outage_days(restore_orders(grid, order[None, :]), total_pop)[0]
+
+    # Only the order of the damaged nodes matters (first in the greedy order)
+    head = int((grid.init_damaged.sum(axis=1) > 0).sum())
+    if head < 2:
+        return order
+
+    while time.time() - start < time_limit:
+
+        # Neighbours: move a node to a position up to a random distance away
+        candidates = np.tile(order, (batch, 1))
+        i = random.randint(0, head, batch)
+        span = 2 ** random.randint(0, int(np.log2(head)) + 1, batch)
+        step = (random.random_sample(batch) * span).astype(np.int64) + 1
+        j = np.clip(i + random.choice([-1, 1], batch) * step, 0, head - 1)
+        for k in range(batch):
+            if i[k] != j[k]:
+                row = np.delete(candidates[k], i[k])
+                candidates[k] = np.insert(row, j[k], order[i[k]])
+
+        # Best neighbour replaces the order when it has fewer customer-outage-days
+        days = outage_days(restore_orders(grid, candidates), total_pop)
+        k = days.argmin()
+        if days[k] < best:
+            best = days[k]
+            order = candidates[k]
+
+    return order
@@ -0,0 +1,20 @@
+#=============================================================================#
+# Plotting
+# Optional: needs matplotlib, and is not imported by gridrestore itself
+#=============================================================================#
+
+import matplotlib.pyplot as plt
+
+
+# ================================#
+# Percent of the population with power at each timestep
+# ================================#
+def plot_restore(restore, ax=None, **kwargs):
+    # restore - Grid.restore (DataFrame of restore_cols)
+    # kwargs  - passed to ax.plot (label, color, linestyle, marker, ...)
+    if ax is None:
+        ax = plt.gca()
+    ax.plot(restore.loc[:, 'time'], restore.loc[:, 'total_pwr_fr'] * 100.0, **kwargs)
+    ax.set_xlabel('Timesteps (-)')
+    ax.set_ylabel('% With Power')
+    return ax
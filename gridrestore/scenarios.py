@@ -0,0 +1,125 @@
+#=============================================================================#
+# Scenario Builder
+# Scenario tables built in memory from a base system and a capacity mix, the
+# same tables examples/*/prepare_scenarios.py writes to CSV, passed straight
+# to Grid (or run_sweep) so any number of mixes can be run without files
+#=============================================================================#
+
+import numpy as np
+from gridrestore.synthetic import scenario_cols, wt_size, solar_size, trans_distance, dist_distance
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Columns of a base system (examples/*/data.csv)
+base_cols = ['Node', 'Region', 'Population', 'Windspeed_mph', 'Transmission_km', 'Substations', 'Distribution_km']
+
+# Capacity mix: electric network included and generation capacity (GW)
+default_mix = {'trans': True, 'sub': True, 'dist': True,
+               'central_fossil': 0.0, 'central_solar': 0.0, 'central_wind': 0.0,
+               'dist_fossil': 0.0, 'dist_solar': 0.0, 'dist_wind': 0.0}
+
+# Scenarios A-D of examples/test/prepare_scenarios.py
+# (examples/puerto_rico uses another mix for D)
+scenario_mixes = {
+    'A': {'central_fossil': 4.2 + 0.7}, # Centralized w/ NG
+    'B': {'central_fossil': 3.9 + 0.7, 'central_solar': 4.1, 'central_wind': 1.0}, # Centralized w/ renewables
+    'C': {'trans': False, 'sub': False, 'dist_fossil': 4.2 + 0.7}, # Distributed w/ NG
+    'D': {'trans': False, 'sub': False, 'dist_fossil': 3.17 + 0.7, 'dist_solar': 0.0, 'dist_wind': 4.4}, # Distributed w/ renewables
+}
+
+
+# ================================#
+# Builder (base system read once)
+# ================================#
+class ScenarioBuilder(object):
+
+    def __init__(self, base):
+        # base - base system: CSV filename (without .csv, as for Grid) or DataFrame with base_cols
+        if isinstance(base, basestring):
+            base = pd.read_csv(base + '.csv')
+        missing = [col for col in base_cols if col not in base.columns]
+        if len(missing) > 0:
+            raise ValueError('Base system without columns: ' + ', '.join(missing))
+
+        self.node = np.asarray(base['Node'], dtype=object)
+        self.population = np.asarray(base['Population'], dtype=np.float64)
+        self.windspeed = np.asarray(base['Windspeed_mph'], dtype=np.float64)
+        self.trans_km = np.asarray(base['Transmission_km'], dtype=np.float64)
+        self.substations = np.asarray(base['Substations'], dtype=np.float64)
+        self.dist_km = np.asarray(base['Distribution_km'], dtype=np.float64)
+        self.n_nodes = len(self.node)
+        self.total_pop = self.population.sum()
+
+        # Regions in order of appearance, one central node each
+        codes, regions = pd.factorize(np.asarray(base['Region'], dtype=object))
+        self.region = np.asarray(base['Region'], dtype=object)
+        self.regions = np.asarray(regions, dtype=object)
+        n_regions = len(self.regions)
+        self.region_pop = np.bincount(codes, self.population, n_regions)
+        self.region_wind = np.bincount(codes, self.windspeed, n_regions) / np.bincount(codes, minlength=n_regions)
+
+    # ================================#
+    # Scenario table of one capacity mix
+    # ================================#
+    def build(self, **mix):
+        # mix - see default_mix (missing entries take the default)
+        # returns a DataFrame with scenario_cols: distributed nodes, then one central node per region
+        unknown = [name for name in mix if name not in default_mix]
+        if len(unknown) > 0:
+            raise ValueError('Unknown capacity mix entries: ' + ', '.join(sorted(unknown)))
+        m = dict(default_mix)
+        m.update(mix)
+        central_total = m['central_fossil'] + m['central_solar'] + m['central_wind']
+        dist_total = m['dist_fossil'] + m['dist_solar'] + m['dist_wind']
+        n_regions = len(self.regions)
+        zeros = np.zeros(n_regions)
+
+        # Distributed capacity by population, central capacity by region population (MW)
+        solar_mw = np.concatenate((m['dist_solar'] * 1000.0 * self.population / self.total_pop,
+                                   m['central_solar'] * 1000.0 * self.region_pop / self.total_pop))
+        wind_mw = np.concatenate((m['dist_wind'] * 1000.0 * self.population / self.total_pop,
+                                  m['central_wind'] * 1000.0 * self.region_pop / self.total_pop))
+        total_mw = np.concatenate((dist_total * 1000.0 * self.population / self.total_pop,
+                                   central_total * 1000.0 * self.region_pop / self.total_pop))
+
+        # Electric network (central nodes have none)
+        trans_km = np.concatenate((self.trans_km * float(m['trans']), zeros))
+        substations = np.concatenate((self.substations * float(m['sub']), zeros))
+        dist_km = np.concatenate((self.dist_km * float(m['dist']), zeros))
+
+        columns = {
+            'Node': np.concatenate((self.node, 'central_' + self.regions)),
+            'Region': np.concatenate((self.region, self.regions)),
+            'Population': np.concatenate((self.population, zeros)),
+            'Windspeed_mph': np.concatenate((self.windspeed, self.region_wind)), # Average over the region
+            'Transmission_km': trans_km,
+            'Substations': substations,
+            'Distribution_km': dist_km,
+            'Solar_MW': solar_mw,
+            'Wind_MW': wind_mw,
+            'Total_MW': total_mw,
+            'Central': np.repeat(np.array(['N', 'Y'], dtype=object), [self.n_nodes, n_regions]),
+            # Number of wind turbines, solar farms, trans and dist towers
+            'Solar_farms': np.ceil(solar_mw / solar_size),
+            'Wind_turbines': np.ceil(wind_mw / wt_size),
+            'Transmission_towers': np.ceil(trans_km / trans_distance),
+            'Distribution_towers': np.ceil(dist_km / dist_distance)}
+        return pd.DataFrame(columns, columns=scenario_cols)
+
+    # ================================#
+    # Scenario tables of many mixes
+    # ================================#
+    def build_all(self, mixes):
+        # mixes - dict of name: mix, or list of mixes (named by position)
+        if not isinstance(mixes, dict):
+            mixes = dict(enumerate(mixes))
+        return dict((name, self.build(**mix)) for name, mix in mixes.items())
+
+
+# ================================#
+# Build one scenario
+# ================================#
+def build_scenario(base, **mix):
+    # base - see ScenarioBuilder; mix - see default_mix
+    return ScenarioBuilder(base).build(**mix)
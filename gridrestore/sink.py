@@ -0,0 +1,284 @@
+#=============================================================================#
+# Result Sink
+# Trajectories and per-run summaries streamed to disk in chunks instead of
+# being kept as one DataFrame per run. Chunks are written by a background
+# thread (I/O overlaps the restoration runs) and partitioned by scenario and
+# policy. Parquet (pyarrow or fastparquet) or HDF5 (PyTables) when installed,
+# CSV otherwise.
+#
+# results/trajectories/scenario=A/policy=0/part-00000.parquet
+# results/summary/scenario=A/policy=0/part-00000.parquet
+# results/trajectories.h5   - HDF5: one file per table, one key per partition
+#=============================================================================#
+
+import os
+import pkgutil
+import sys
+import threading
+import Queue
+import numpy as np
+from gridrestore.trajectory import restore_cols
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+formats = ['parquet', 'hdf5', 'csv']
+extensions = {'parquet': '.parquet', 'hdf5': '.h5', 'csv': '.csv'}
+
+# Per-run metrics of the summary table
+summary_cols = ['n_steps', 'days', 'total_cost', 'min_pwr_fr', 'days_to_90', 'pop_outage_days']
+
+
+# ================================#
+# Output format
+# ================================#
+def _installed(module):
+    # Found without importing it
+    return pkgutil.find_loader(module) is not None
+
+
+def available_format():
+    # First of formats whose library is installed (CSV needs none)
+    if _installed('pyarrow') or _installed('fastparquet'):
+        return 'parquet'
+    if _installed('tables'):
+        return 'hdf5'
+    return 'csv'
+
+
+# ================================#
+# Summary metrics of one run
+# ================================#
+def run_summary(columns):
+    # columns - Grid.restore columns (Trajectory.columns)
+    time, costs, total_outage_fr, total_pwr_fr, pop_wo_pwr, pop_w_pwr = columns
+    restored = np.flatnonzero(total_pwr_fr >= 0.9)
+    n_steps = len(time)
+    return {'n_steps': n_steps,
+            'days': time[-1] if n_steps > 0 else 0.0,
+            'total_cost': costs.sum(),
+            'min_pwr_fr': total_pwr_fr.min() if n_steps > 0 else np.nan,
+            'days_to_90': time[restored[0]] if len(restored) > 0 else np.nan, # first day >= 90% with power
+            'pop_outage_days': pop_wo_pwr.sum()} # people without power x days
+
+
+# ================================#
+# Partition directory name
+# ================================#
+def _partition_dir(name, value):
+    value = str(value).replace(os.sep, '_').replace('/', '_')
+    return name + '=' + value
+
+
+def _partition_key(partition):
+    # HDF5 key of a partition
+    return '/'.join([name + '_' + ''.join([c if c.isalnum() else '_' for c in str(value)])
+                     for name, value in partition]) or 'all'
+
+
+# ================================#
+# Trajectory and summary tables of buffered runs
+# ================================#
+def _frames(runs):
+    # runs - (run, labels, columns, summary) of one partition
+    run_ids, run_labels, run_columns, summaries = zip(*runs)
+    names = sorted(set(name for labels in run_labels for name in labels))
+    lengths = [len(columns[0]) for columns in run_columns]
+    table = dict((col, np.concatenate([columns[j] for columns in run_columns])) for j, col in enumerate(restore_cols))
+    table['run'] = np.repeat(run_ids, lengths)
+    for name in names:
+        table[name] = np.repeat([labels.get(name) for labels in run_labels], lengths)
+    trajectories = pd.DataFrame(table, columns=['run'] + names + restore_cols)
+    return trajectories, pd.DataFrame(list(summaries), columns=['run'] + names + summary_cols)
+
+
+# ================================#
+# Sink
+# ================================#
+class ResultSink(object):
+
+    def __init__(self, path, format=None, partition_by=('scenario', 'policy'), chunk_rows=100000, max_chunks=4):
+        # path         - output directory
+        # format       - 'parquet', 'hdf5' or 'csv' (default: see available_format)
+        # partition_by - labels that split the output (those a run does not have are skipped)
+        # chunk_rows   - trajectory rows buffered before they are handed to the writer
+        # max_chunks   - chunks waiting for the writer; write blocks when full, so memory is bounded
+        if format is None:
+            format = available_format()
+        if format not in formats:
+            raise ValueError('Unknown result format: ' + str(format))
+        self.path = path
+        self.format = format
+        self.partition_by = list(partition_by)
+        self.chunk_rows = chunk_rows
+        self.n_runs = 0 # runs written, also the run id of the next one
+        self.closed = False
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        # Runs of each partition not yet handed to the writer
+        self.buffers = {}
+        self.buffered_rows = 0
+        self.parts = {} # next part number of each partition
+
+        # Writer thread; an error is raised in the caller at the next write or close
+        self.error = None
+        self.queue = Queue.Queue(max_chunks)
+        self.thread = threading.Thread(target=self._writer)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ================================#
+    # Add one run
+    # ================================#
+    def write(self, columns, labels=None):
+        # columns - Grid.restore columns (Trajectory.columns)
+        # labels  - dict of name -> value of the run (e.g. scenario, policy and parameters)
+        self._check()
+        if labels is None:
+            labels = {}
+        partition = tuple((name, labels[name]) for name in self.partition_by if name in labels)
+        run = self.n_runs
+        self.n_runs = self.n_runs + 1
+
+        # Copied: the columns may be views into a buffer that is reused
+        columns = [np.array(values, dtype=np.float64) for values in columns]
+        summary = run_summary(columns)
+        summary['run'] = run
+        summary.update(labels)
+        self.buffers.setdefault(partition, []).append((run, labels, columns, summary))
+
+        self.buffered_rows = self.buffered_rows + len(columns[0])
+        if self.buffered_rows >= self.chunk_rows:
+            self.flush()
+        return run
+
+    # ================================#
+    # Add every run of an EnsembleResult
+    # ================================#
+    def write_ensemble(self, result, total_pop, labels=None):
+        # labels - dict of name -> one value per run (as EnsembleResult.to_frame)
+        runs = []
+        for r in range(len(result.n_steps)):
+            n = result.n_steps[r]
+            total_outage_fr = result.total_outage_fr[r, :n]
+            total_pwr_fr = 1.0 - total_outage_fr
+            columns = [result.time[:n].astype(np.float64), result.costs[r, :n], total_outage_fr, total_pwr_fr,
+                       total_outage_fr * total_pop, total_pwr_fr * total_pop]
+            run_labels = None
+            if labels is not None:
+                run_labels = dict((name, np.asarray(values)[r]) for name, values in labels.items())
+            runs.append(self.write(columns, run_labels))
+        return runs
+
+    # ================================#
+    # Hand buffered runs to the writer (blocks while max_chunks are waiting)
+    # ================================#
+    def flush(self):
+        self._check()
+        chunk = []
+        for partition, runs in self.buffers.items():
+            part = self.parts.get(partition, 0)
+            self.parts[partition] = part + 1
+            chunk.append((partition, part, runs))
+        self.buffers = {}
+        self.buffered_rows = 0
+        if len(chunk) > 0:
+            self.queue.put(chunk)
+
+    # ================================#
+    # Write what is left and stop the writer
+    # ================================#
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+        self._raise()
+
+    def _check(self):
+        self._raise()
+        if self.closed:
+            raise ValueError('Result sink is closed')
+
+    def _raise(self):
+        # Error of the writer thread, raised once
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error[0], error[1], error[2]
+
+    # ================================#
+    # Writer thread
+    # ================================#
+    def _writer(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            # After an error chunks are dropped, so the caller never blocks on a full queue
+            if self.error is None:
+                try:
+                    for partition, part, runs in chunk:
+                        trajectories, summary = _frames(runs)
+                        self._write('trajectories', partition, part, trajectories)
+                        self._write('summary', partition, part, summary)
+                except Exception:
+                    self.error = sys.exc_info()
+
+    def _write(self, table, partition, part, frame):
+        if self.format == 'hdf5':
+            # Object columns padded so later chunks with longer labels fit
+            strings = dict((col, 64) for col in frame.columns if frame[col].dtype == object)
+            frame.to_hdf(os.path.join(self.path, table + '.h5'), _partition_key(partition), format='table',
+                         append=True, index=False, min_itemsize=strings or None)
+            return
+        directory = os.path.join(self.path, table, *[_partition_dir(name, value) for name, value in partition])
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filename = os.path.join(directory, 'part-%05d' % part + extensions[self.format])
+        if self.format == 'parquet':
+            frame.to_parquet(filename, index=False)
+        else:
+            frame.to_csv(filename, index=False, float_format='%.17g') # Every digit, read back exactly
+
+
+# ================================#
+# Read results back (optionally only some partitions)
+# ================================#
+def read_results(path, table='trajectories', **partition):
+    # partition - e.g. scenario='A', policy=0: only runs of matching partitions are read
+    # returns one DataFrame ordered by run
+    filename = os.path.join(path, table + '.h5')
+    if os.path.isfile(filename):
+        wanted = [_partition_key([(name, value)]) for name, value in sorted(partition.items())]
+        with pd.HDFStore(filename, mode='r') as store:
+            keys = [key for key in store.keys() if all(w in key.strip('/').split('/') for w in wanted)]
+            frames = [store.select(key) for key in keys]
+    else:
+        wanted = [_partition_dir(name, value) for name, value in partition.items()]
+        frames = []
+        for directory, subdirs, files in os.walk(os.path.join(path, table)):
+            subdirs.sort()
+            parts = os.path.relpath(directory, os.path.join(path, table)).split(os.sep)
+            if not all(w in parts for w in wanted):
+                continue
+            for name in sorted(files):
+                if name.endswith('.parquet'):
+                    frames.append(pd.read_parquet(os.path.join(directory, name)))
+                elif name.endswith('.csv'):
+                    frames.append(pd.read_csv(os.path.join(directory, name), float_precision='round_trip'))
+    if len(frames) == 0:
+        return pd.DataFrame()
+    results = pd.concat(frames, ignore_index=True, sort=False)
+    return results.sort_values('run', kind='mergesort').reset_index(drop=True)
@@ -0,0 +1,230 @@
+#=============================================================================#
+# Streaming Ensemble Statistics
+# Summary curves of total_pwr_fr over any number of runs, kept as running
+# per-day moments (Welford, combined batch by batch), a histogram sketch per
+# day for quantiles and the distribution of days until a restoration
+# threshold. Memory does not grow with the number of runs, and statistics of
+# separate workers merge (counts exactly, moments up to rounding).
+#
+# Column j is the j-th saved timestep of a run (as TrajectoryStore); shorter
+# runs are padded with their last value, longer runs are truncated.
+#=============================================================================#
+
+import multiprocessing
+import sys
+import numpy as np
+from gridrestore.trajectory import restore_cols
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+
+class EnsembleStats(object):
+
+    def __init__(self, n_days, bins=1000, threshold=0.9):
+        # n_days    - timesteps summarized per run
+        # bins      - histogram bins on [0, 1]: quantiles are within 1 / bins
+        # threshold - total_pwr_fr of the days-to-restore distribution
+        self.n_days = n_days
+        self.bins = bins
+        self.threshold = threshold
+        self.n = 0 # runs
+        self.mean = np.zeros(n_days)
+        self.m2 = np.zeros(n_days) # sum of squared deviations from the mean
+        self.min = np.full(n_days, np.inf)
+        self.max = np.full(n_days, -np.inf)
+        self.counts = np.zeros((n_days, bins), dtype=np.int64)
+        # Runs first reaching the threshold on each day; later or never: not_reached
+        self.days_to = np.zeros(n_days, dtype=np.int64)
+        self.not_reached = 0
+
+    # ================================#
+    # Add runs
+    # ================================#
+    def write(self, columns, labels=None):
+        # Same call as ResultSink.write, so restore_grid(sink=stats) and run_sweep(sink=stats)
+        # feed the statistics directly (labels are not used)
+        self.add(columns[restore_cols.index('total_pwr_fr')], columns[0])
+
+    def flush(self):
+        pass
+
+    def add(self, total_pwr_fr, time=None):
+        # total_pwr_fr - one run (e.g. Grid.restore['total_pwr_fr'])
+        # time         - day of each value (default 0, 1, ...), for days_to
+        values = np.asarray(total_pwr_fr, dtype=np.float64)
+        self.add_curves(values[None, :], [len(values)], time)
+
+    def add_ensemble(self, result):
+        # result - EnsembleResult (rows already padded with the last value)
+        self.add_curves(result.total_pwr_fr, result.n_steps, result.time)
+
+    def add_curves(self, curves, n_steps=None, time=None):
+        # curves  - (runs, days) total_pwr_fr, e.g. TrajectoryStore.curves(runs)
+        # n_steps - saved timesteps of each run (default: the full width)
+        # time    - day of each column (default 0, 1, ...)
+        curves = np.asarray(curves, dtype=np.float64)
+        n_runs, width = curves.shape
+        if n_runs == 0:
+            return
+        n_steps = np.full(n_runs, width) if n_steps is None else np.minimum(n_steps, width)
+        time = np.arange(width) if time is None else np.asarray(time)[:width]
+
+        # Fixed width: padded with the last saved value, or truncated
+        block = np.empty((n_runs, self.n_days))
+        keep = min(width, self.n_days)
+        block[:, :keep] = curves[:, :keep]
+        steps = np.arange(self.n_days)
+        last = curves[np.arange(n_runs), np.maximum(n_steps, 1) - 1]
+        block = np.where(steps[None, :] < n_steps[:, None], block, last[:, None])
+
+        # Moments of the block, combined with the running moments
+        mean = block.mean(axis=0)
+        m2 = ((block - mean) ** 2).sum(axis=0)
+        self._combine(n_runs, mean, m2)
+        self.min = np.minimum(self.min, block.min(axis=0))
+        self.max = np.maximum(self.max, block.max(axis=0))
+
+        # Histogram of each day
+        index = np.clip((block * self.bins).astype(np.int64), 0, self.bins - 1)
+        index += (steps * self.bins)[None, :]
+        self.counts += np.bincount(index.ravel(), minlength=self.n_days * self.bins).reshape(self.n_days, self.bins)
+
+        # First day at or above the threshold (among the saved timesteps)
+        above = (curves >= self.threshold) & (np.arange(width)[None, :] < n_steps[:, None])
+        reached = above.any(axis=1)
+        days = np.asarray(time[above.argmax(axis=1)[reached]], dtype=np.int64)
+        within = days < self.n_days
+        self.days_to += np.bincount(days[within], minlength=self.n_days)
+        self.not_reached += n_runs - within.sum()
+
+    def _combine(self, n, mean, m2):
+        # Chan et al. parallel update of the mean and sum of squared deviations
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    # ================================#
+    # Merge statistics of another worker
+    # ================================#
+    def merge(self, other):
+        if (other.n_days, other.bins, other.threshold) != (self.n_days, self.bins, self.threshold):
+            raise ValueError('EnsembleStats with different n_days, bins or threshold')
+        if other.n == 0:
+            return self
+        self._combine(other.n, other.mean, other.m2)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.counts += other.counts
+        self.days_to += other.days_to
+        self.not_reached += other.not_reached
+        return self
+
+    # ================================#
+    # Summary curves
+    # ================================#
+    def variance(self, ddof=1):
+        return self.m2 / max(self.n - ddof, 1)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def quantile(self, q):
+        # Per day, interpolated within the histogram bin (exact at q = 0 and 1)
+        target = q * self.n
+        cum = self.counts.cumsum(axis=1)
+        b = np.minimum((cum < target).sum(axis=1), self.bins - 1)
+        days = np.arange(self.n_days)
+        before = np.where(b > 0, cum[days, b - 1], 0)
+        inside = self.counts[days, b]
+        fraction = np.where(inside > 0, (target - before) / np.maximum(inside, 1), 0.0)
+        value = (b + np.clip(fraction, 0.0, 1.0)) / float(self.bins)
+        return np.clip(value, self.min, self.max)
+
+    def to_frame(self, quantiles=(0.05, 0.5, 0.95)):
+        # One row per day: mean, std, min, max and the quantiles (p5, p50, p95, ...)
+        frame = pd.DataFrame({'day': np.arange(self.n_days), 'mean': self.mean, 'std': self.std(),
+                              'min': self.min, 'max': self.max},
+                             columns=['day', 'mean', 'std', 'min', 'max'])
+        for q in quantiles:
+            frame['p%g' % (q * 100)] = self.quantile(q)
+        return frame
+
+    # ================================#
+    # Days until the threshold is reached
+    # ================================#
+    def days_to_distribution(self):
+        # Runs by first day at or above the threshold (not_reached holds the others)
+        return pd.Series(self.days_to, index=np.arange(self.n_days))
+
+    def days_to_quantile(self, q):
+        # Smallest day by which a fraction q of all runs reached the threshold (inf if none)
+        cum = self.days_to.cumsum()
+        day = np.searchsorted(cum, q * self.n)
+        return float(day) if day < self.n_days and self.n > 0 else np.inf
+
+
+# ================================#
+# Merge the statistics of several workers
+# ================================#
+def merge_stats(stats):
+    stats = list(stats)
+    merged = EnsembleStats(stats[0].n_days, stats[0].bins, stats[0].threshold)
+    for s in stats:
+        merged.merge(s)
+    return merged
+
+
+# ================================#
+# Statistics of a large stochastic ensemble, restored in batches
+# ================================#
+# Grid of the running ensemble_stats, shared with forked workers
+_grid = None
+
+
+def _init_worker(grid):
+    global _grid
+    if grid is not None:
+        _grid = grid
+
+
+def _batch_stats(task):
+    n, seed, n_days, bins, threshold = task
+    stats = EnsembleStats(n_days, bins, threshold)
+    stats.add_ensemble(_grid.restore_ensemble(n, seed=seed, max_days=n_days))
+    return stats
+
+
+def ensemble_stats(grid, n_realizations, n_days, batch_size=1000, seed=None, processes=1, bins=1000,
+                   threshold=0.9):
+    # Only one batch of runs is held at a time (per worker); the result is the same
+    # for any number of processes
+    # processes - pool size (None: number of cores); each worker returns the statistics of its batches
+    global _grid
+
+    # One seed per batch
+    random_state = np.random.RandomState(seed)
+    sizes = [min(batch_size, n_realizations - start) for start in range(0, n_realizations, batch_size)]
+    tasks = [(n, random_state.randint(2 ** 31 - 1), n_days, bins, threshold) for n in sizes]
+
+    stats = EnsembleStats(n_days, bins, threshold)
+    _grid = grid
+    try:
+        if processes == 1:
+            for task in tasks:
+                stats.merge(_batch_stats(task))
+        else:
+            initargs = (grid,) if sys.platform == 'win32' else (None,)
+            pool = multiprocessing.Pool(processes, _init_worker, initargs)
+            try:
+                # In order, so the merged moments do not depend on scheduling
+                for batch in pool.imap(_batch_stats, tasks):
+                    stats.merge(batch)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _grid = None
+    return stats
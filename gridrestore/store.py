@@ -0,0 +1,145 @@
+#=============================================================================#
+# Trajectory Store
+# total_pwr_fr of many runs in one memory-mapped (runs x days) array on disk,
+# with the parameters of each run in a sidecar table. Rows are padded with the
+# last value after full restoration so every run has the same width. Worker
+# processes write disjoint rows of the same files in parallel, and any rows
+# are read without loading the others.
+#
+# store/schema.json   - runs, days, dtype and parameter columns
+# store/pwr_fr.npy    - (runs, days) total_pwr_fr, column j = j-th saved timestep
+# store/n_steps.npy   - saved timesteps of each run (-1: not written yet)
+# store/params.csv    - parameters of each run (row = run)
+#=============================================================================#
+
+import json
+import os
+import numpy as np
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+format_name = 'gridrestore-trajectories'
+format_version = 1
+
+
+# ================================#
+# Create an empty store
+# ================================#
+def create_store(path, params, n_days, dtype=np.float64):
+    # params - DataFrame of parameters, one row per run, or the number of runs
+    # n_days - width of each row; longer runs are truncated (n_steps keeps their length)
+    # returns the store opened for writing
+    if not isinstance(params, pd.DataFrame):
+        params = pd.DataFrame(index=np.arange(params))
+    params = params.reset_index(drop=True)
+    n_runs = len(params)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    # Files are allocated, not filled: pages of rows not written take no disk space
+    pwr_fr = np.lib.format.open_memmap(os.path.join(path, 'pwr_fr.npy'), mode='w+', dtype=dtype,
+                                       shape=(n_runs, n_days))
+    del pwr_fr
+    n_steps = np.lib.format.open_memmap(os.path.join(path, 'n_steps.npy'), mode='w+', dtype=np.int32,
+                                        shape=(n_runs,))
+    n_steps[:] = -1
+    n_steps.flush()
+    del n_steps
+    params.to_csv(os.path.join(path, 'params.csv'), index_label='run')
+
+    # Schema written last: a directory without it is not a store
+    schema = {'format': format_name, 'version': format_version, 'n_runs': n_runs, 'n_days': n_days,
+              'dtype': np.dtype(dtype).str, 'params': [str(col) for col in params.columns]}
+    with open(os.path.join(path, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=1, sort_keys=True)
+    return TrajectoryStore(path, 'r+')
+
+
+def open_store(path, mode='r'):
+    # mode - 'r' (read-only) or 'r+' (write rows)
+    return TrajectoryStore(path, mode)
+
+
+# ================================#
+# Store
+# ================================#
+class TrajectoryStore(object):
+
+    def __init__(self, path, mode='r'):
+        with open(os.path.join(path, 'schema.json')) as f:
+            schema = json.load(f)
+        if schema.get('format') != format_name or schema.get('version') != format_version:
+            raise ValueError('Not a ' + format_name + ' v' + str(format_version) + ' store: ' + path)
+        self.path = path
+        self.mode = mode
+        self.n_runs = schema['n_runs']
+        self.n_days = schema['n_days']
+        self.pwr_fr = np.load(os.path.join(path, 'pwr_fr.npy'), mmap_mode=mode)
+        self.n_steps = np.load(os.path.join(path, 'n_steps.npy'), mmap_mode=mode)
+        self._params = None
+
+    def __len__(self):
+        return self.n_runs
+
+    # Parameter table, read when first used
+    @property
+    def params(self):
+        if self._params is None:
+            self._params = pd.read_csv(os.path.join(self.path, 'params.csv'), index_col='run')
+        return self._params
+
+    # ================================#
+    # Write one run
+    # ================================#
+    def write(self, run, total_pwr_fr):
+        # total_pwr_fr - Grid.restore['total_pwr_fr'] of the run
+        values = np.asarray(total_pwr_fr)
+        n = len(values)
+        width = min(n, self.n_days)
+        row = self.pwr_fr[run]
+        row[:width] = values[:width]
+        row[width:] = values[-1] if n > 0 else np.nan # Padding: restored from here on
+        self.n_steps[run] = n
+
+    # ================================#
+    # Write consecutive runs of an EnsembleResult
+    # ================================#
+    def write_ensemble(self, start, result):
+        # start - run of the first row of the result
+        n = len(result.n_steps)
+        width = min(result.total_outage_fr.shape[1], self.n_days)
+        block = self.pwr_fr[start:start + n]
+        block[:, :width] = 1.0 - result.total_outage_fr[:, :width]
+        # Rows of the result already repeat the last value after restoration
+        block[:, width:] = 1.0 - result.total_outage_fr[:, -1:]
+        self.n_steps[start:start + n] = result.n_steps
+
+    def flush(self):
+        # Written rows to disk (other processes see them through the page cache anyway)
+        if self.mode != 'r':
+            self.pwr_fr.flush()
+            self.n_steps.flush()
+
+    # ================================#
+    # Runs by parameter value
+    # ================================#
+    def select(self, **params):
+        # params - e.g. scenario='scenarioA', budget=12.27; returns the matching runs
+        table = self.params
+        match = np.ones(self.n_runs, dtype=bool)
+        for name, value in params.items():
+            match &= np.asarray(table[name] == value)
+        return np.flatnonzero(match)
+
+    # ================================#
+    # Curves of some runs (only those rows are read)
+    # ================================#
+    def curves(self, runs=None, days=None):
+        # runs - run numbers, slice or boolean mask (default: all, as a view of the file)
+        # days - number of days (default: all)
+        rows = self.pwr_fr if runs is None else self.pwr_fr[runs]
+        return rows[:, :days]
+
+    def written(self):
+        return self.n_steps >= 0
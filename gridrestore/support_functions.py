@@ -4,7 +4,9 @@
 #=============================================================================#
 
 import numpy as np
-import pandas as pd
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
 
 
 # ================================#
@@ -22,7 +24,9 @@ def and_fault(f_a, f_b):
 # Calculate fraction damaged
 # ================================#
 
-def damage_fraction(system, state):
+def damage_fraction(system, state, powered=None):
+    # powered - nodes with a transmission path through the network (gridrestore.network),
+    #           None for the single path
 
     partial_restore = False
 
@@ -42,7 +46,10 @@ def damage_fraction(system, state):
         state.loc[:, 'solar_fr'] = np.ceil(state.loc[:, 'solar_d']) / system.loc[:, 'Solar_Farms']
         state.loc[:, 'wind_fr'] = np.ceil(state.loc[:, 'wind_d']) / system.loc[:, 'Wind_Turbines']
 
-    trans_single_path = True
+    trans_single_path = powered is None
+
+    if trans_single_path == False:
+        state.loc[:, 'trans_fr'] = np.where(powered, 0.0, 1.0)
 
     if trans_single_path == True:
         ind = state.loc[:,'trans_fr']>0
@@ -85,11 +92,15 @@ def outage(system, state, debug):
     wind_f = state.loc[:, 'wind_fr']
 
 
+    # Centralized flag, compared once rather than once per region
+    central = system.Central == 'Y'
+
     for region in system.loc[:,"Region"].unique():
 
         # Get centralized and distributed nodes for this region
-        ind_c = (system.Region == region) & (system.Central == 'Y')
-        ind_d = (system.Region == region) & (system.Central != 'Y')
+        in_region = system.Region == region
+        ind_c = in_region & central
+        ind_d = in_region & ~central
 
         # ----------------
         # Power generation
@@ -158,8 +169,8 @@ def save_timestep(restore, system, t, costs, total_outage_fr):
     t_n['pop_wo_pwr'] = (total_outage_fr) * tot_pop
     t_n['pop_w_pwr'] = (1.0 - total_outage_fr) * tot_pop
 
-    # Append Series to DataFrame
-    restore = restore.append(t_n, ignore_index=True)
+    # Append Series to DataFrame (Grid itself stores timesteps in a Trajectory buffer)
+    restore = pd.concat([restore, t_n.to_frame().T], ignore_index=True)
 
     # Return updated Pandas Dataframe
     return restore
\ No newline at end of file
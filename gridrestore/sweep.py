@@ -0,0 +1,144 @@
+#=============================================================================#
+# Policy / Scenario Sweep
+# Scenarios x Grid parameters run on a process pool
+#=============================================================================#
+
+import itertools
+import multiprocessing
+import sys
+import numpy as np
+from gridrestore.model import Grid
+from gridrestore.store import create_store, open_store
+from gridrestore.trajectory import restore_cols
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Grid parameters that can be swept (arguments of Grid.fork)
+sweep_params = ['budget', 'delay', 'sort_type', 'sort_order', 'sort_update', 'restore_method', 'event_driven',
+                'incremental', 'jit']
+
+# Loaded and damaged grids, one per scenario. Set in the parent before the pool
+# starts, so forked workers share these arrays page for page instead of
+# receiving a pickled copy with every task.
+_grids = {}
+
+# Trajectory stores opened by this process, by path
+_stores = {}
+
+
+# ================================#
+# Worker
+# ================================#
+def _init_worker(grids):
+    global _grids
+    if grids is not None:
+        _grids = grids
+
+
+def _run(task):
+    i, scenario, params, store = task
+    grid = _grids[scenario].fork(**params)
+    grid.restore_grid()
+    if store is not None:
+        # The worker writes row i of the store itself; only the run number is sent back
+        if store not in _stores:
+            _stores[store] = open_store(store, 'r+')
+        _stores[store].write(i, grid.trajectory.columns()[restore_cols.index('total_pwr_fr')])
+        return i, None
+    return i, grid.trajectory.columns()
+
+
+# ================================#
+# Parameter combinations
+# ================================#
+def expand_params(params):
+    # params - dict of lists (every combination is run) or list of dicts
+    if isinstance(params, dict):
+        names = sorted(params.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*[params[name] for name in names])]
+    return [dict(p) for p in params]
+
+
+# ================================#
+# Run sweep
+# ================================#
+def run_sweep(scenarios, params, processes=None, backend='array', chunksize=1, sink=None, store=None,
+              store_days=365):
+    # scenarios - scenario filenames (as passed to Grid), or dict of name: filename or scenario
+    #             table (e.g. ScenarioBuilder.build_all), the name is used in the table
+    # params    - Grid parameters to sweep, see expand_params and sweep_params
+    # processes - pool size (default: number of cores); 1 runs in this process
+    # sink      - ResultSink: runs are streamed to it as they finish (labelled with scenario,
+    #             policy = index of the parameter combination, and parameters) and None is returned
+    # store     - path of a TrajectoryStore written by the workers (run = row of the task table,
+    #             store_days wide); the store is returned opened for reading
+    # returns one tidy DataFrame: scenario, parameters, then the Grid.restore columns
+    global _grids
+
+    combos = expand_params(params)
+    for p in combos:
+        for name in p:
+            if name not in sweep_params:
+                raise ValueError('Unknown sweep parameter: ' + str(name))
+    if isinstance(scenarios, dict):
+        labels = sorted(scenarios)
+    else:
+        labels = list(scenarios)
+        scenarios = dict((scenario, scenario) for scenario in labels)
+    tasks = [(i, scenario, p, store) for i, (scenario, p) in enumerate(itertools.product(labels, combos))]
+    if store is not None:
+        runs = pd.DataFrame([p for i, scenario, p, s in tasks], columns=sorted(set(name for p in combos for name in p)))
+        runs.insert(0, 'policy', [i % len(combos) for i, scenario, p, s in tasks])
+        runs.insert(0, 'scenario', [scenario for i, scenario, p, s in tasks])
+        create_store(store, runs, store_days)
+
+    # Load and damage each scenario once
+    _grids = dict((scenario, Grid(scenarios[scenario], backend=backend)) for scenario in labels)
+
+    results = [None] * len(tasks)
+
+    def collect(i, columns):
+        if columns is None:
+            return # written to the store by the worker
+        if sink is None:
+            results[i] = columns
+        else:
+            # Written as they arrive, so finished runs are not held in memory
+            labels = dict(tasks[i][2])
+            labels['scenario'] = tasks[i][1]
+            labels['policy'] = i % len(combos)
+            sink.write(columns, labels)
+
+    if processes == 1:
+        for task in tasks:
+            collect(*_run(task))
+    else:
+        # Without fork the grids are sent once per worker, not once per task
+        initargs = (_grids,) if sys.platform == 'win32' else (None,)
+        pool = multiprocessing.Pool(processes, _init_worker, initargs)
+        try:
+            for i, columns in pool.imap_unordered(_run, tasks, chunksize):
+                collect(i, columns)
+        finally:
+            pool.close()
+            pool.join()
+    _grids = {}
+    if store is not None:
+        _stores.clear()
+        return open_store(store)
+    if sink is not None:
+        sink.flush()
+        return None
+
+    # ---------------------------------------
+    # Tidy table keyed by the parameters
+    # ---------------------------------------
+    names = sorted(set(name for p in combos for name in p))
+    lengths = [len(columns[0]) for columns in results]
+    table = dict((col, np.concatenate([columns[j] for columns in results])) for j, col in enumerate(restore_cols))
+    table['scenario'] = np.repeat([scenario for i, scenario, p, s in tasks], lengths)
+    for name in names:
+        table[name] = np.repeat([p.get(name) for i, scenario, p, s in tasks], lengths)
+
+    return pd.DataFrame(table, columns=['scenario'] + names + restore_cols)
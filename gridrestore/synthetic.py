@@ -0,0 +1,172 @@
+#=============================================================================#
+# Synthetic Systems
+# Grid-compatible scenario files of any size, generated and written in chunks
+#=============================================================================#
+
+import math
+import numpy as np
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Columns of a scenario file (as written by examples/*/prepare_scenarios.py)
+scenario_cols = ['Node', 'Region', 'Population', 'Windspeed_mph', 'Transmission_km', 'Substations',
+                 'Distribution_km', 'Solar_MW', 'Wind_MW', 'Total_MW', 'Central', 'Solar_farms',
+                 'Wind_turbines', 'Transmission_towers', 'Distribution_towers']
+
+# Wind turbine and solar farm sizes
+wt_size = 2.0 # MW
+solar_size = 0.3 # MW
+
+# Distance between support structures
+trans_distance = 0.23 # km
+dist_distance = 0.042 # km
+
+
+# ================================#
+# Synthetic system definition
+# ================================#
+class SyntheticSystem(object):
+
+    def __init__(self, n_nodes, n_regions=5, seed=None,
+                 pop_median=33500.0, pop_sigma=0.8,  # Population per node (lognormal)
+                 trans=True, sub=True, dist=True,  # Electric network included
+                 trans_km_pp=1.05E-3, sub_pp=1.09E-4, dist_km_pp=7.33E-3,  # Asset densities (per person)
+                 central_fossil=1.39, central_solar=0.0, central_wind=0.0,  # Capacity (kW per person)
+                 dist_fossil=0.0, dist_solar=0.0, dist_wind=0.0,
+                 wind_max=156.0, wind_min=60.0, wind_radius=0.35, wind_noise=5.0):  # Hurricane (mph)
+
+        # Defaults follow the bundled Puerto Rico data (scenario A). Nodes lie on a
+        # unit square and belong to the nearest region centre; peak windspeed
+        # decays with distance from a straight hurricane track across the square.
+        self.n_nodes = n_nodes # distributed nodes, one central node per region is added
+        self.n_regions = n_regions
+        self.seed = seed
+        self.pop_median = pop_median
+        self.pop_sigma = pop_sigma
+        self.trans = trans
+        self.sub = sub
+        self.dist = dist
+        self.trans_km_pp = trans_km_pp
+        self.sub_pp = sub_pp
+        self.dist_km_pp = dist_km_pp
+        self.central_fossil = central_fossil
+        self.central_solar = central_solar
+        self.central_wind = central_wind
+        self.dist_fossil = dist_fossil
+        self.dist_solar = dist_solar
+        self.dist_wind = dist_wind
+        self.wind_max = wind_max
+        self.wind_min = wind_min
+        self.wind_radius = wind_radius
+        self.wind_noise = wind_noise
+
+        self.random = np.random.RandomState(seed)
+        self.regions = np.array(['region_' + str(r) for r in range(n_regions)])
+        self.region_xy = self.random.uniform(0.0, 1.0, (n_regions, 2))
+        # Hurricane track: point on the square and heading
+        self.track_xy = self.random.uniform(0.25, 0.75, 2)
+        self.track_angle = self.random.uniform(0.0, np.pi)
+
+    # ================================#
+    # Peak windspeed at x, y (mph)
+    # ================================#
+    def windspeed(self, xy):
+        normal = np.array([-math.sin(self.track_angle), math.cos(self.track_angle)])
+        distance = np.abs(np.dot(xy - self.track_xy, normal))
+        wind = self.wind_min + (self.wind_max - self.wind_min) * np.exp(-distance / self.wind_radius)
+        wind = wind + self.random.normal(0.0, self.wind_noise, len(distance))
+        return np.clip(np.round(wind), self.wind_min, self.wind_max)
+
+    # ================================#
+    # Distributed nodes start..stop
+    # ================================#
+    def chunk(self, start, stop):
+        n = stop - start
+        xy = self.random.uniform(0.0, 1.0, (n, 2))
+        region_code = np.argmin(((xy[:, None, :] - self.region_xy[None, :, :]) ** 2).sum(axis=2), axis=1)
+        population = np.round(self.pop_median * np.exp(self.random.normal(0.0, self.pop_sigma, n)))
+
+        df = pd.DataFrame(index=np.arange(start, stop))
+        df.loc[:, 'Node'] = ['node_' + str(i) for i in range(start, stop)]
+        df.loc[:, 'Region'] = self.regions[region_code]
+        df.loc[:, 'Population'] = population
+        df.loc[:, 'Windspeed_mph'] = self.windspeed(xy)
+
+        # Electric network
+        df.loc[:, 'Transmission_km'] = population * self.trans_km_pp * self.random.lognormal(0.0, 0.3, n) * self.trans
+        df.loc[:, 'Substations'] = self.random.poisson(population * self.sub_pp) * float(self.sub)
+        df.loc[:, 'Distribution_km'] = population * self.dist_km_pp * self.random.lognormal(0.0, 0.3, n) * self.dist
+
+        # Distributed capacity (kW per person -> MW)
+        df.loc[:, 'Solar_MW'] = population * self.dist_solar / 1000.0
+        df.loc[:, 'Wind_MW'] = population * self.dist_wind / 1000.0
+        df.loc[:, 'Total_MW'] = population * (self.dist_fossil + self.dist_solar + self.dist_wind) / 1000.0
+        df.loc[:, 'Central'] = 'N'
+
+        return self.count_assets(df), region_code
+
+    # ================================#
+    # Central node of each region
+    # ================================#
+    def central(self, start, region_pop, region_wind):
+        n = self.n_regions
+        df = pd.DataFrame(index=np.arange(start, start + n))
+        df.loc[:, 'Node'] = ['central_' + region for region in self.regions]
+        df.loc[:, 'Region'] = self.regions
+        df.loc[:, 'Population'] = 0.0
+        df.loc[:, 'Windspeed_mph'] = region_wind # Average over the region
+        df.loc[:, 'Transmission_km'] = 0.0
+        df.loc[:, 'Substations'] = 0.0
+        df.loc[:, 'Distribution_km'] = 0.0
+        df.loc[:, 'Solar_MW'] = region_pop * self.central_solar / 1000.0
+        df.loc[:, 'Wind_MW'] = region_pop * self.central_wind / 1000.0
+        df.loc[:, 'Total_MW'] = region_pop * (self.central_fossil + self.central_solar + self.central_wind) / 1000.0
+        df.loc[:, 'Central'] = 'Y'
+        return self.count_assets(df)
+
+    # ================================#
+    # Number of wind turbines, solar farms, trans and dist towers
+    # ================================#
+    def count_assets(self, df):
+        df.loc[:, 'Solar_farms'] = np.ceil(df.loc[:, 'Solar_MW'] / solar_size)
+        df.loc[:, 'Wind_turbines'] = np.ceil(df.loc[:, 'Wind_MW'] / wt_size)
+        df.loc[:, 'Transmission_towers'] = np.ceil(df.loc[:, 'Transmission_km'] / trans_distance)
+        df.loc[:, 'Distribution_towers'] = np.ceil(df.loc[:, 'Distribution_km'] / dist_distance)
+        return df.loc[:, scenario_cols]
+
+    # ================================#
+    # Iterate over chunks of the system (central nodes last)
+    # ================================#
+    def chunks(self, chunksize=100000):
+        region_pop = np.zeros(self.n_regions)
+        region_wind = np.zeros(self.n_regions)
+        region_n = np.zeros(self.n_regions)
+        for start in range(0, self.n_nodes, chunksize):
+            df, region_code = self.chunk(start, min(start + chunksize, self.n_nodes))
+            region_pop += np.bincount(region_code, df.loc[:, 'Population'].values, self.n_regions)
+            region_wind += np.bincount(region_code, df.loc[:, 'Windspeed_mph'].values, self.n_regions)
+            region_n += np.bincount(region_code, minlength=self.n_regions)
+            yield df
+        region_wind = np.where(region_n > 0, region_wind / np.maximum(region_n, 1), self.wind_min)
+        yield self.central(self.n_nodes, region_pop, region_wind)
+
+    # ================================#
+    # Write scenario file chunk by chunk
+    # ================================#
+    def to_csv(self, filename, chunksize=100000):
+        # filename without '.csv', as passed to Grid
+        with open(filename + '.csv', 'w') as f:
+            header = True
+            for df in self.chunks(chunksize):
+                df.to_csv(f, header=header)
+                header = False
+        return filename
+
+
+# ================================#
+# Generate and write a synthetic scenario
+# ================================#
+def write_synthetic(filename, n_nodes, chunksize=100000, **kwargs):
+    # kwargs - see SyntheticSystem
+    return SyntheticSystem(n_nodes, **kwargs).to_csv(filename, chunksize)
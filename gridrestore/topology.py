@@ -0,0 +1,195 @@
+#=============================================================================#
+# Topology Index
+# Static region/central structure used by the vectorized outage calculation
+#=============================================================================#
+
+import numpy as np
+from gridrestore.support_functions import or_fault
+from gridrestore.fragility_curves import asset_counts
+from gridrestore.network import Network
+
+
+# ================================#
+# Index built once per system
+# ================================#
+class Topology(object):
+
+    def __init__(self, system, edges=None):
+        # edges - (edges, 2) node positions of a transmission network (see gridrestore.network);
+        #         None: transmission single path (any damaged tower cuts the node)
+
+        # Integer region codes
+        self.regions, self.region_code = np.unique(np.asarray(system['Region']), return_inverse=True)
+        self.n_regions = len(self.regions)
+        self.n_nodes = len(self.region_code)
+
+        # Centralized and distributed nodes
+        self.central = np.asarray(system['Central']) == 'Y'
+        self.distributed = ~self.central
+        self.central_nodes = np.flatnonzero(self.central)
+        self.central_code = self.region_code[self.central_nodes]
+
+        # Number of each component type
+        self.counts = asset_counts(system)
+        self.counted = self.counts > 0
+
+        # Population and capacity
+        self.population = np.asarray(system['Population'], dtype=np.float64)
+        self.total_pop = self.population.sum()
+        self.solar_cap = np.asarray(system['Solar_MW'], dtype=np.float64)
+        self.wind_cap = np.asarray(system['Wind_MW'], dtype=np.float64)
+        self.total_cap = np.asarray(system['Total_MW'], dtype=np.float64)
+
+        # Central capacity in each region
+        self.central_total_cap = np.bincount(self.central_code, weights=self.total_cap[self.central_nodes],
+                                             minlength=self.n_regions)
+
+        # Nodes of each region: region_nodes[region_start[r]:region_start[r + 1]]
+        self.region_nodes = np.argsort(self.region_code, kind='mergesort')
+        self.region_start = np.searchsorted(self.region_code[self.region_nodes], np.arange(self.n_regions + 1))
+
+        # Transmission network, with the central plants as sources
+        self.network = None if edges is None else Network(self.n_nodes, edges, self.central_nodes)
+
+    # ================================#
+    # Nodes belonging to a set of regions
+    # ================================#
+    def members(self, regions):
+        return np.concatenate([self.region_nodes[self.region_start[r]:self.region_start[r + 1]] for r in regions])
+
+    # ================================#
+    # Calculate fraction damaged
+    # ================================#
+    def damage_fraction(self, damaged, nodes=None, powered=None):
+        # damaged - (..., nodes, component types), or the rows of the given nodes
+        # powered - with a network: nodes of the whole system with a transmission path
+        #           (computed from damaged when None, which needs every node)
+        counts = self.counts if nodes is None else self.counts[nodes]
+        counted = self.counted if nodes is None else self.counted[nodes]
+
+        # Fraction of each component type; nan (none installed) is replaced with 0
+        fraction = np.ceil(damaged)
+        np.divide(fraction, counts, out=fraction, where=counted)
+
+        trans_fr = fraction[..., 0]
+        if self.network is None:
+            # Transmission single path: any damaged tower cuts the node
+            trans_fr[trans_fr > 0] = 1.0
+        else:
+            # Transmission network: cut unless connected to a central plant through undamaged nodes
+            if powered is None:
+                if nodes is not None:
+                    raise ValueError('powered is needed for the damage fraction of a subset of nodes')
+                powered = self.network.powered(trans_fr == 0)
+            elif nodes is not None:
+                powered = powered[..., nodes]
+            trans_fr[...] = np.where(powered, 0.0, 1.0)
+        return fraction
+
+    # ================================#
+    # Calculate outage in each municipality
+    # ================================#
+    def outage(self, fraction):
+        # fraction - (..., nodes, component types)
+        # returns outage fraction of each node (nan for central nodes) and total outage fraction
+        lead = fraction.shape[:-2]
+        fraction = fraction.reshape((-1,) + fraction.shape[-2:])
+        n_runs = fraction.shape[0]
+
+        solar_f_cap = fraction[:, :, 3] * self.solar_cap
+        wind_f_cap = fraction[:, :, 4] * self.wind_cap
+
+        # ----------------
+        # Power generation
+        # ----------------
+        # Centralized - segment sums over the central nodes of each region
+        bins = (np.arange(n_runs)[:, None] * self.n_regions + self.central_code).ravel()
+        size = n_runs * self.n_regions
+        central_solar_f_cap = np.bincount(bins, weights=solar_f_cap[:, self.central_nodes].ravel(), minlength=size)
+        central_wind_f_cap = np.bincount(bins, weights=wind_f_cap[:, self.central_nodes].ravel(), minlength=size)
+        central_total_cap = np.tile(self.central_total_cap, n_runs)
+
+        central_pwr_f = np.zeros(size)
+        has_central = central_total_cap > 0
+        central_pwr_f[has_central] = (central_solar_f_cap[has_central] + central_wind_f_cap[has_central]) \
+                                     / central_total_cap[has_central]
+        central_pwr_f = central_pwr_f.reshape(n_runs, self.n_regions)[:, self.region_code]
+
+        # Distributed
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist_pwr_f = np.nan_to_num((solar_f_cap + wind_f_cap) / self.total_cap)
+
+        # Combined centralized & distributed
+        power_f = or_fault(central_pwr_f, dist_pwr_f)
+
+        # ----------------
+        # Electric network
+        # ----------------
+        network_f = or_fault(or_fault(fraction[:, :, 0], fraction[:, :, 1]), fraction[:, :, 2])
+
+        # ----------------
+        # Combined (distributed nodes only)
+        # ----------------
+        outage_fr = or_fault(network_f, power_f)
+        outage_fr[:, self.central] = np.nan
+
+        # ----------------
+        # Calculate total outage
+        # ----------------
+        outage_pop = np.nan_to_num(outage_fr * self.population)
+        total_outage_fr = outage_pop.sum(axis=-1) / self.total_pop
+
+        outage_fr = outage_fr.reshape(lead + (self.n_nodes,))
+        total_outage_fr = total_outage_fr.reshape(lead)[()]
+        return outage_fr, total_outage_fr
+
+    # ================================#
+    # Central power fault of each region (single run)
+    # ================================#
+    def central_power(self, fraction, regions=None):
+        # fraction - (nodes, component types); returns one value per region (or per given region)
+        # Same arithmetic as outage, so the values are identical
+        if regions is None:
+            nodes = self.central_nodes
+            code = self.central_code
+            n = self.n_regions
+            central_total_cap = self.central_total_cap
+        else:
+            regions = np.asarray(regions)
+            included = np.in1d(self.central_code, regions)
+            nodes = self.central_nodes[included]
+            code = np.searchsorted(regions, self.central_code[included])
+            n = len(regions)
+            central_total_cap = self.central_total_cap[regions]
+
+        central_solar_f_cap = np.bincount(code, weights=fraction[nodes, 3] * self.solar_cap[nodes], minlength=n)
+        central_wind_f_cap = np.bincount(code, weights=fraction[nodes, 4] * self.wind_cap[nodes], minlength=n)
+
+        central_pwr_f = np.zeros(n)
+        has_central = central_total_cap > 0
+        central_pwr_f[has_central] = (central_solar_f_cap[has_central] + central_wind_f_cap[has_central]) \
+                                     / central_total_cap[has_central]
+        return central_pwr_f
+
+    # ================================#
+    # Outage of a set of nodes (single run)
+    # ================================#
+    def node_outage(self, fraction, central_pwr_f, nodes):
+        # fraction      - (nodes, component types) of the whole system
+        # central_pwr_f - central power fault of every region, from central_power
+        # returns outage fraction of the given nodes (nan for central nodes)
+        f = fraction[nodes]
+
+        # Power generation
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist_pwr_f = np.nan_to_num((f[:, 3] * self.solar_cap[nodes] + f[:, 4] * self.wind_cap[nodes])
+                                       / self.total_cap[nodes])
+        power_f = or_fault(central_pwr_f[self.region_code[nodes]], dist_pwr_f)
+
+        # Electric network
+        network_f = or_fault(or_fault(f[:, 0], f[:, 1]), f[:, 2])
+
+        # Combined (distributed nodes only)
+        outage_fr = or_fault(network_f, power_f)
+        outage_fr[self.central[nodes]] = np.nan
+        return outage_fr
@@ -0,0 +1,88 @@
+#=============================================================================#
+# Trajectory Buffer
+# Restoration results stored column by column in growable NumPy arrays
+#=============================================================================#
+
+import numpy as np
+from gridrestore.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+# Columns of Grid.restore
+restore_cols = ['time', 'costs', 'total_outage_fr', 'total_pwr_fr', 'pop_wo_pwr', 'pop_w_pwr']
+
+
+# ================================#
+# Growable columnar buffer (capacity doubles as needed)
+# ================================#
+class Trajectory(object):
+
+    def __init__(self, total_pop, capacity=64):
+        self.total_pop = total_pop
+        self.n = 0
+        self.time = np.zeros(capacity)
+        self.costs = np.zeros(capacity)
+        self.total_outage_fr = np.zeros(capacity)
+
+    def __len__(self):
+        return self.n
+
+    # ================================#
+    # Make room for n_new more timesteps
+    # ================================#
+    def reserve(self, n_new):
+        capacity = len(self.time)
+        if self.n + n_new > capacity:
+            while self.n + n_new > capacity:
+                capacity = capacity * 2
+            for name in ['time', 'costs', 'total_outage_fr']:
+                grown = np.zeros(capacity)
+                grown[:self.n] = getattr(self, name)[:self.n]
+                setattr(self, name, grown)
+
+    # ================================#
+    # Save timestep
+    # ================================#
+    def append(self, t, costs, total_outage_fr):
+        self.reserve(1)
+        self.time[self.n] = t
+        self.costs[self.n] = costs
+        self.total_outage_fr[self.n] = total_outage_fr
+        self.n = self.n + 1
+
+    # ================================#
+    # Save several timesteps at once
+    # ================================#
+    def extend(self, t, costs, total_outage_fr):
+        t = np.atleast_1d(t)
+        n_new = len(t)
+        self.reserve(n_new)
+        self.time[self.n:self.n + n_new] = t
+        self.costs[self.n:self.n + n_new] = costs
+        self.total_outage_fr[self.n:self.n + n_new] = total_outage_fr
+        self.n = self.n + n_new
+
+    # ================================#
+    # Columns of Grid.restore (views into the buffer where possible)
+    # ================================#
+    def columns(self):
+        total_outage_fr = self.total_outage_fr[:self.n]
+        total_pwr_fr = 1.0 - total_outage_fr
+        return [self.time[:self.n], self.costs[:self.n], total_outage_fr, total_pwr_fr,
+                total_outage_fr * self.total_pop, total_pwr_fr * self.total_pop]
+
+    # ================================#
+    # Build DataFrame
+    # ================================#
+    def to_frame(self):
+        return pd.DataFrame(dict(zip(restore_cols, self.columns())), columns=restore_cols)
+
+    # ================================#
+    # Write CSV straight from the arrays (same layout as DataFrame.to_csv)
+    # ================================#
+    def to_csv(self, filename):
+        rows = np.column_stack(self.columns()).tolist()
+        with open(filename, 'w') as f:
+            f.write(',' + ','.join(restore_cols) + '\n')
+            for i, row in enumerate(rows):
+                f.write(str(i) + ',' + ','.join([repr(value) for value in row]) + '\n')
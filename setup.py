@@ -10,4 +10,8 @@ setup(name='gridrestore',
       packages=['gridrestore'],
       zip_safe=False,
       python_requires='~=2.7',
-      install_requires=['pandas', 'numpy', 'matplotlib', 'seaborn'])
\ No newline at end of file
+      install_requires=['pandas', 'numpy'],
+      extras_require={'plot': ['matplotlib', 'seaborn'], # gridrestore.plotting and the example figures
+                      'jit': ['numba'], # Grid(jit=True)
+                      'parquet': ['pyarrow'], # ResultSink(format='parquet')
+                      'hdf5': ['tables']}) # ResultSink(format='hdf5')
\ No newline at end of file